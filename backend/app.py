@@ -5,37 +5,139 @@ Post-Quantum Secure Data Sharing Platform — Backend.
 
 import sys
 import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 
 # Ensure backend dir is on the path for module imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from flask import Flask
+import orjson
+from flask import Flask, jsonify
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
+from sqlalchemy import event, insert
 
 from config import Config
-from models import db
+from models import db, init_db
 
 jwt = JWTManager()
 
+# WAL lets readers run alongside the single writer; NORMAL sync is safe
+# under WAL and avoids an fsync per commit. Never use cache=shared.
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA busy_timeout=5000',
+    'PRAGMA cache_size=-20000',  # ~20 MB page cache
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA foreign_keys=ON',
+)
+# The 'ro' bind opens the file with mode=ro, where switching the journal
+# mode fails with "attempt to write a readonly database": per-connection
+# settings only.
+SQLITE_READ_PRAGMAS = (
+    'PRAGMA busy_timeout=5000',
+    'PRAGMA cache_size=-20000',
+    'PRAGMA temp_store=MEMORY',
+)
+
+
+def _sqlite_pragma_listener(pragmas):
+    def set_pragmas(dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+    return set_pragmas
+
+
+class OrjsonProvider(JSONProvider):
+    """
+    JSON provider backed by orjson. Datetimes are serialized natively
+    (naive values are UTC), so to_dict() can return them as-is.
+    """
+
+    option = orjson.OPT_NAIVE_UTC
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=self.option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Hand orjson's bytes straight to the response; dumps() would
+        # decode to str only for Werkzeug to encode it again.
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, option=self.option), mimetype='application/json'
+        )
+
+
+def _cpu_executor(max_workers):
+    """
+    Thread pool for blocking CPU work. Under gunicorn's gevent worker the
+    threading module is monkey-patched into greenlets, so use gevent's pool
+    of real OS threads there; waiting on it yields to other greenlets.
+    """
+    try:
+        from gevent import monkey
+        if monkey.is_module_patched('threading'):
+            from gevent.threadpool import ThreadPoolExecutor as GeventExecutor
+            return GeventExecutor(max_workers=max_workers)
+    except ImportError:
+        pass
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='bcrypt')
+
 
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
+    app.json = OrjsonProvider(app)
 
     # Extensions
     db.init_app(app)
+    with app.app_context():
+        for bind_key, engine in db.engines.items():
+            pragmas = SQLITE_READ_PRAGMAS if bind_key == 'ro' else SQLITE_PRAGMAS
+            event.listen(engine, 'connect', _sqlite_pragma_listener(pragmas))
     CORS(app, origins=app.config.get('CORS_ORIGINS', '*'),
          supports_credentials=True)
     jwt.init_app(app)
 
-    # Wire up token blocklist
-    from routes.auth_routes import token_blocklist_check
+    # Shared Redis client (token blocklist); optional for local dev
+    if app.config.get('REDIS_URL'):
+        import redis
+        pool = redis.ConnectionPool.from_url(
+            app.config['REDIS_URL'],
+            max_connections=app.config['REDIS_MAX_CONNECTIONS'],
+        )
+        app.extensions['redis'] = redis.Redis(connection_pool=pool)
+
+    # Shared pool for CPU-bound bcrypt work (see auth_routes._run_bcrypt)
+    app.extensions['bcrypt_executor'] = _cpu_executor(os.cpu_count() or 2)
+
+    # Batched background writer for client-reported history rows
+    from audit import HistoryWriter
+    app.extensions['history_writer'] = HistoryWriter(app)
+
+    # Wire up token blocklist and login rate limiting
+    from routes.auth_routes import token_blocklist_check, limiter
     jwt.token_in_blocklist_loader(token_blocklist_check)
+    limiter.init_app(app)
 
-    # Create tables
-    with app.app_context():
-        db.create_all()
+    @app.errorhandler(429)
+    def rate_limited(e):
+        return jsonify({'error': 'Too many attempts, try again later'}), 429
+
+    # Schema sync is a deploy-time step (`flask init-db`); running it in
+    # every worker on boot is opt-in for development.
+    if app.config['AUTO_MIGRATE']:
+        with app.app_context():
+            init_db()
 
     # Register blueprints
     from routes.auth_routes import auth_bp
@@ -48,6 +150,73 @@ def create_app(config_class=Config):
     app.register_blueprint(settings_bp, url_prefix='/api/settings')
     app.register_blueprint(groups_bp, url_prefix='/api/groups')
 
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create missing tables and indexes."""
+        init_db()
+        print('Database schema is up to date')
+
+    @app.cli.command('reshard-storage')
+    def reshard_storage():
+        """Move blobs from the old xx/<uuid>.enc layout into xx/yy/."""
+        from models import FileMetadata
+        from routes.files_routes import shard_dir
+
+        storage = app.config['STORAGE_DIR']
+        moved = 0
+        for meta in FileMetadata.query.all():
+            old_rel = meta.storage_path
+            if len(old_rel.replace('\\', '/').split('/')) != 2:
+                continue  # already sharded two levels deep
+            name = os.path.basename(old_rel)
+            new_rel = os.path.join(shard_dir(name), name)
+            old_full = os.path.join(storage, old_rel)
+            new_full = os.path.join(storage, new_rel)
+            if os.path.exists(old_full):
+                os.makedirs(os.path.dirname(new_full), exist_ok=True)
+                os.replace(old_full, new_full)
+            meta.storage_path = new_rel
+            db.session.commit()  # keep each row in step with its blob
+            moved += 1
+        print(f'Resharded {moved} file(s)')
+
+    @app.cli.command('migrate-kem-ciphertexts')
+    def migrate_kem_ciphertexts():
+        """Move group-share KEM ciphertexts from the JSON blob into per-member rows."""
+        from models import User, GroupFileAccess, GroupFileAccessCiphertext
+
+        # Legacy blobs were never validated: keep only entries for real users
+        user_ids = {uid for (uid,) in db.session.query(User.id)}
+        migrated = skipped = 0
+        for access in GroupFileAccess.query.filter(GroupFileAccess.kem_ciphertexts != '{}').all():
+            access_id = access.id
+            try:
+                kem_cts = orjson.loads(access.kem_ciphertexts)
+            except orjson.JSONDecodeError:
+                kem_cts = None
+            if not isinstance(kem_cts, dict):
+                print(f'Skipping access {access_id}: unreadable kem_ciphertexts')
+                skipped += 1
+                continue
+            rows = []
+            for uid, ct in kem_cts.items():
+                if not (uid.isdecimal() and int(uid) in user_ids and isinstance(ct, str) and ct):
+                    print(f'Access {access_id}: dropping entry for user {uid!r}')
+                    continue
+                rows.append({'access_id': access_id, 'user_id': int(uid), 'ciphertext': ct})
+            try:
+                if rows:
+                    db.session.execute(insert(GroupFileAccessCiphertext), rows)
+                access.kem_ciphertexts = '{}'
+                db.session.commit()  # one share at a time; safe to re-run
+            except Exception as e:
+                db.session.rollback()
+                print(f'Skipping access {access_id}: {e}')
+                skipped += 1
+                continue
+            migrated += 1
+        print(f'Migrated {migrated} group share(s), skipped {skipped}')
+
     # Health check
     @app.route('/api/health')
     def health():
@@ -60,4 +229,6 @@ def create_app(config_class=Config):
 app = create_app()
 
 if __name__ == '__main__':
+    with app.app_context():
+        init_db()
     app.run(host='0.0.0.0', port=5000, debug=True)
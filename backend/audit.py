@@ -0,0 +1,75 @@
+"""
+Background writer for client-reported audit rows (FileHistory).
+
+Request threads only enqueue a row; a daemon thread drains the queue and
+inserts rows in batches (up to BATCH_SIZE rows, or whatever arrived within
+FLUSH_INTERVAL seconds) with a single executemany + commit.
+"""
+
+import atexit
+import queue
+import threading
+import time
+
+from sqlalchemy import insert
+
+from models import db, FileHistory
+
+BATCH_SIZE = 100
+FLUSH_INTERVAL = 1.0  # seconds
+
+_STOP = object()
+
+
+class HistoryWriter:
+    def __init__(self, app, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self._app = app
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name='history-writer', daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, row):
+        """Queue a FileHistory row (dict of column values) for insertion."""
+        self._queue.put(row)
+
+    def close(self, timeout=5.0):
+        """Flush whatever is queued and stop the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch = [first]
+            deadline = time.monotonic() + self._flush_interval
+            while len(batch) < self._batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    row = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if row is _STOP:
+                    stopping = True
+                    break
+                batch.append(row)
+            self._flush(batch)
+
+    def _flush(self, rows):
+        with self._app.app_context():
+            try:
+                db.session.execute(insert(FileHistory), rows)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                self._app.logger.exception('Failed to write %d history rows', len(rows))
@@ -3,19 +3,43 @@ from datetime import timedelta
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 datadir = os.path.join(basedir, '..', 'data')
-storagedir = os.path.join(basedir, '..', 'storage')
+storagedir = os.environ.get('STORAGE_DIR') or os.path.join(basedir, '..', 'storage')
 
 os.makedirs(datadir, exist_ok=True)
 os.makedirs(storagedir, exist_ok=True)
 
+_sqlite_path = os.path.join(datadir, 'byteguard.db')
+_database_url = os.environ.get('DATABASE_URL')
+
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY', 'byteguard-dev-secret-change-in-production')
-    SQLALCHEMY_DATABASE_URI = os.environ.get(
-        'DATABASE_URL',
-        f'sqlite:///{os.path.join(datadir, "byteguard.db")}'
+    # Key for the BLAKE2b password pre-hash; changing it invalidates stored passwords
+    PASSWORD_PEPPER = os.environ.get('PASSWORD_PEPPER', SECRET_KEY)
+    SQLALCHEMY_DATABASE_URI = _database_url or f'sqlite:///{_sqlite_path}'
+    # Reads go through a separate 'ro' pool; with SQLite the default engine
+    # is the single writer, so readers never starve behind it (and vice versa).
+    SQLALCHEMY_BINDS = {
+        'ro': {
+            'url': (os.environ.get('DATABASE_RO_URL') or _database_url
+                    or f'sqlite:///file:{_sqlite_path}?mode=ro&uri=true'),
+            'pool_size': os.cpu_count() or 4,
+        },
+    }
+    # Keep workers × (pool_size + max_overflow) within the server's
+    # max_connections. SQLite keeps a single pooled writer connection.
+    SQLALCHEMY_ENGINE_OPTIONS = (
+        {'pool_size': 1, 'max_overflow': 0}
+        if SQLALCHEMY_DATABASE_URI.startswith('sqlite') else {
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', '20')),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', '10')),
+            'pool_pre_ping': True,
+            'pool_recycle': 3600,
+        }
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Create tables on every app start (dev only); production runs `flask init-db`
+    AUTO_MIGRATE = os.environ.get('BYTEGUARD_AUTO_MIGRATE') == '1'
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'byteguard-jwt-secret-change-in-production')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=int(os.environ.get('JWT_EXPIRY_HOURS', '24')))
     JWT_TOKEN_LOCATION = ['headers']
@@ -23,4 +47,11 @@ class Config:
     JWT_HEADER_TYPE = 'Bearer'
     MAX_CONTENT_LENGTH = 100 * 1024 * 1024  # 100 MB
     STORAGE_DIR = storagedir
+    # Offload blob downloads to the front proxy: nginx internal location
+    # prefix for X-Accel-Redirect, or X-Sendfile for Apache/lighttpd.
+    STORAGE_ACCEL_PREFIX = os.environ.get('STORAGE_ACCEL_PREFIX')
+    USE_X_SENDFILE = os.environ.get('USE_X_SENDFILE') == '1'
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', '*')
+    REDIS_URL = os.environ.get('REDIS_URL')  # unset → in-process fallbacks
+    REDIS_MAX_CONNECTIONS = int(os.environ.get('REDIS_MAX_CONNECTIONS', '50'))
+    RATELIMIT_STORAGE_URI = REDIS_URL or 'memory://'
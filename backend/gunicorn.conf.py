@@ -0,0 +1,17 @@
+"""
+Gunicorn settings for the ByteGuard backend: `gunicorn -c gunicorn.conf.py app:app`.
+
+gevent workers let one process multiplex many slow requests (uploads,
+downloads, bcrypt); the gevent worker monkey-patches the stdlib itself
+before the app is imported. Size DB pools so that
+workers × (pool_size + max_overflow) stays within the database's limit.
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2))
+worker_class = 'gevent'
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', '1000'))
+timeout = 120
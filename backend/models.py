@@ -9,16 +9,80 @@ Tables:
   - UserSettings: per-user preferences
 """
 
+from contextlib import contextmanager
 from datetime import datetime, timezone
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
-db = SQLAlchemy()
+
+class RoutingSession(Session):
+    """Session that can pin its reads to a named bind (see read_only())."""
+
+    read_bind_key = None
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.read_bind_key and not self._flushing:
+            engine = self._db.engines.get(self.read_bind_key)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+# Single-column indexes replaced by the named composites in __table_args__
+SUPERSEDED_INDEXES = (
+    'ix_group_memberships_group_id',
+    'ix_group_memberships_user_id',
+    'ix_group_file_access_file_id',
+    'ix_group_file_access_group_id',
+)
+
+
+def init_db():
+    """Create missing tables and indexes. Run once per deploy, not per worker."""
+    db.create_all()
+    # create_all() skips existing tables; add indexes declared since
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+    with db.engine.begin() as conn:
+        for name in SUPERSEDED_INDEXES:
+            conn.execute(db.text(f'DROP INDEX IF EXISTS {name}'))
+
+
+@contextmanager
+def read_only():
+    """
+    Route queries issued inside the block to the read-only 'ro' bind, so
+    listing endpoints never queue behind the single writer connection.
+    Falls back to the default engine when no 'ro' bind is configured.
+    """
+    session = db.session()
+    previous = session.read_bind_key
+    session.read_bind_key = 'ro'
+    try:
+        yield session
+    finally:
+        session.read_bind_key = previous
+
+
+def upsert_insert(model):
+    """INSERT construct supporting ON CONFLICT for the bound database."""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return pg_insert(model)
+    return sqlite_insert(model)
 
 
 class User(db.Model):
     __tablename__ = 'users'
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    # Researcher IDs are case-sensitive: equality, uniqueness and login
+    # compare them byte for byte; only search_users ignores case
     researcher_id = db.Column(db.String(120), unique=True, nullable=False, index=True)
     password_hash = db.Column(db.String(256), nullable=False)
     kyber_public_key = db.Column(db.Text, nullable=True)  # base64-encoded Kyber-512 public key
@@ -26,18 +90,25 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
 
     # Relationships
-    files = db.relationship('FileMetadata', backref='owner', lazy='dynamic',
+    files = db.relationship('FileMetadata', backref='owner', lazy='select',
                             foreign_keys='FileMetadata.owner_id')
     settings = db.relationship('UserSettings', backref='user', uselist=False,
                                cascade='all, delete-orphan')
 
+    # SQLite-only NOCASE index so search_users' case-insensitive prefix LIKE
+    # is an index range scan; the collation name does not exist elsewhere
+    __table_args__ = (
+        db.Index('ix_users_researcher_id_nocase',
+                 researcher_id.collate('NOCASE')).ddl_if(dialect='sqlite'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
             'researcherId': self.researcher_id,
             'role': self.role,
             'hasKyberKey': self.kyber_public_key is not None,
-            'createdAt': self.created_at.isoformat() if self.created_at else None,
+            'createdAt': self.created_at,
         }
 
 
@@ -56,7 +127,7 @@ class FileMetadata(db.Model):
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
 
     # Relationships
-    shares = db.relationship('SharedAccess', backref='file', lazy='dynamic',
+    shares = db.relationship('SharedAccess', back_populates='file', lazy='select',
                              cascade='all, delete-orphan')
 
     def to_dict(self):
@@ -68,7 +139,7 @@ class FileMetadata(db.Model):
             'encryptedSize': self.encrypted_size,
             'contentType': self.content_type,
             'sha256Hash': self.sha256_hash,
-            'createdAt': self.created_at.isoformat() if self.created_at else None,
+            'createdAt': self.created_at,
         }
 
 
@@ -77,14 +148,17 @@ class SharedAccess(db.Model):
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     file_id = db.Column(db.Integer, db.ForeignKey('file_metadata.id'), nullable=False, index=True)
-    sender_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    recipient_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    sender_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    recipient_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     kem_ciphertext = db.Column(db.Text, nullable=False)  # base64-encoded Kyber KEM ciphertext
     share_code = db.Column(db.String(20), unique=True, nullable=False, index=True)
     permission = db.Column(db.String(20), default='download')
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
 
     # Relationships
+    # Declared here rather than as a backref: files_routes builds loader
+    # options against SharedAccess.file at import time
+    file = db.relationship('FileMetadata', back_populates='shares')
     sender = db.relationship('User', foreign_keys=[sender_id], backref='sent_shares')
     recipient = db.relationship('User', foreign_keys=[recipient_id], backref='received_shares')
 
@@ -100,7 +174,7 @@ class SharedAccess(db.Model):
             'shareCode': self.share_code,
             'permission': self.permission,
             'kemCiphertext': self.kem_ciphertext,
-            'createdAt': self.created_at.isoformat() if self.created_at else None,
+            'createdAt': self.created_at,
         }
 
 
@@ -118,6 +192,9 @@ class FileHistory(db.Model):
 
     user = db.relationship('User', backref='history')
 
+    # Serves filter_by(user_id=...).order_by(timestamp.desc()) as a range scan
+    __table_args__ = (db.Index('ix_history_user_time', 'user_id', 'timestamp'),)
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -126,7 +203,7 @@ class FileHistory(db.Model):
             'encryptedSize': self.encrypted_size,
             'type': self.file_type,
             'operation': self.operation,
-            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'timestamp': self.timestamp,
         }
 
 
@@ -140,9 +217,9 @@ class Group(db.Model):
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
 
     owner = db.relationship('User', backref='owned_groups', foreign_keys=[owner_id])
-    members = db.relationship('GroupMembership', backref='group', lazy='dynamic',
+    members = db.relationship('GroupMembership', backref='group', lazy='select',
                               cascade='all, delete-orphan')
-    file_access = db.relationship('GroupFileAccess', backref='group', lazy='dynamic',
+    file_access = db.relationship('GroupFileAccess', backref='group', lazy='select',
                                   cascade='all, delete-orphan')
 
     def to_dict(self):
@@ -152,8 +229,8 @@ class Group(db.Model):
             'description': self.description,
             'ownerId': self.owner_id,
             'ownerName': self.owner.researcher_id if self.owner else None,
-            'memberCount': self.members.count(),
-            'createdAt': self.created_at.isoformat() if self.created_at else None,
+            'memberCount': self.member_count,
+            'createdAt': self.created_at,
         }
 
 
@@ -161,14 +238,19 @@ class GroupMembership(db.Model):
     __tablename__ = 'group_memberships'
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    group_id = db.Column(db.Integer, db.ForeignKey('groups.id'), nullable=False, index=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    group_id = db.Column(db.Integer, db.ForeignKey('groups.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     role = db.Column(db.String(20), default='member')  # admin / member
     joined_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
 
     user = db.relationship('User', backref='group_memberships')
 
-    __table_args__ = (db.UniqueConstraint('group_id', 'user_id', name='uq_group_user'),)
+    # uq_group_user serves (group_id, user_id) and group_id lookups;
+    # ix_gm_user_group serves "my groups" by user_id without a table visit
+    __table_args__ = (
+        db.UniqueConstraint('group_id', 'user_id', name='uq_group_user'),
+        db.Index('ix_gm_user_group', 'user_id', 'group_id'),
+    )
 
     def to_dict(self):
         return {
@@ -178,24 +260,41 @@ class GroupMembership(db.Model):
             'researcherId': self.user.researcher_id if self.user else None,
             'hasKyberKey': self.user.kyber_public_key is not None if self.user else False,
             'role': self.role,
-            'joinedAt': self.joined_at.isoformat() if self.joined_at else None,
+            'joinedAt': self.joined_at,
         }
 
 
+# Member count is loaded alongside the group row as a correlated subquery,
+# so serializing a list of groups never issues a COUNT(*) per group.
+Group.member_count = db.column_property(
+    db.select(db.func.count(GroupMembership.id))
+    .where(GroupMembership.group_id == Group.id)
+    .correlate_except(GroupMembership)
+    .scalar_subquery()
+)
+
+
 class GroupFileAccess(db.Model):
     __tablename__ = 'group_file_access'
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    file_id = db.Column(db.Integer, db.ForeignKey('file_metadata.id'), nullable=False, index=True)
-    group_id = db.Column(db.Integer, db.ForeignKey('groups.id'), nullable=False, index=True)
+    file_id = db.Column(db.Integer, db.ForeignKey('file_metadata.id'), nullable=False)
+    group_id = db.Column(db.Integer, db.ForeignKey('groups.id'), nullable=False)
     shared_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    kem_ciphertexts = db.Column(db.Text, nullable=False)  # JSON: { "userId": "base64_kem_ct", ... }
+    # Legacy JSON blob, emptied by `flask migrate-kem-ciphertexts`; see GroupFileAccessCiphertext
+    kem_ciphertexts = db.Column(db.Text, nullable=False, default='{}')
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
 
     file = db.relationship('FileMetadata', backref='group_accesses')
     sharer = db.relationship('User', foreign_keys=[shared_by])
+    ciphertexts = db.relationship('GroupFileAccessCiphertext', backref='access', lazy='select',
+                                  cascade='all, delete-orphan')
 
-    __table_args__ = (db.UniqueConstraint('file_id', 'group_id', name='uq_file_group'),)
+    # uq_file_group serves (file_id, group_id) and file_id lookups
+    __table_args__ = (
+        db.UniqueConstraint('file_id', 'group_id', name='uq_file_group'),
+        db.Index('ix_gfa_group', 'group_id'),
+    )
 
     def to_dict(self):
         return {
@@ -205,11 +304,21 @@ class GroupFileAccess(db.Model):
             'groupId': self.group_id,
             'groupName': self.group.name if self.group else None,
             'sharedBy': self.sharer.researcher_id if self.sharer else None,
-            'kemCiphertexts': self.kem_ciphertexts,
-            'createdAt': self.created_at.isoformat() if self.created_at else None,
+            'createdAt': self.created_at,
         }
 
 
+class GroupFileAccessCiphertext(db.Model):
+    __tablename__ = 'group_file_access_ciphertexts'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    access_id = db.Column(db.Integer, db.ForeignKey('group_file_access.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    ciphertext = db.Column(db.Text, nullable=False)  # base64 KEM payload
+
+    __table_args__ = (db.UniqueConstraint('access_id', 'user_id', name='uq_access_user'),)
+
+
 class UserSettings(db.Model):
     __tablename__ = 'user_settings'
 
@@ -3,22 +3,182 @@ Authentication routes — register, login, logout, session, Kyber key upload.
 Uses JWT (Flask-JWT-Extended) and Bcrypt password hashing.
 """
 
+import os
+import time
+import base64
+import hashlib
+import threading
 import bcrypt
-from flask import Blueprint, request, jsonify
+from cachetools import TTLCache
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import (
     create_access_token, jwt_required, get_jwt_identity, get_jwt
 )
-from models import db, User
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from sqlalchemy import update
+from models import db, read_only, User
+from routes.group_routes import evict_member_pubkeys
 
 auth_bp = Blueprint('auth', __name__)
 
+# Initialised in app.py; storage comes from RATELIMIT_STORAGE_URI
+limiter = Limiter(key_func=get_remote_address)
+
+
+def _login_rate_key():
+    """
+    Rate-limit logins per researcher ID, falling back to the client IP.
+    The ID is case-folded so 'alice', 'Alice', ... share one bucket.
+    """
+    data = request.get_json(silent=True) or {}
+    return (data.get('researcherId') or '').strip().lower() or get_remote_address()
+
 # ── Blocklist for logout ──────────────────────────────────
-# In production use Redis; here we keep in-memory for the prototype
-_revoked_tokens: set[str] = set()
+# Revoked JTIs live in Redis with a TTL equal to the token's remaining
+# lifetime, so logout is shared across workers and entries expire on their
+# own. Without REDIS_URL (local dev) we fall back to a per-process dict.
+_REVOKED_KEY = 'auth:revoked:{}'
+_revoked_tokens: dict[str, float] = {}  # jti -> exp (fallback only)
+
+
+def _redis():
+    return current_app.extensions.get('redis')
 
 
 def is_token_revoked(jwt_header, jwt_payload):
-    return jwt_payload.get('jti') in _revoked_tokens
+    jti = jwt_payload.get('jti')
+    r = _redis()
+    if r is not None:
+        return bool(r.exists(_REVOKED_KEY.format(jti)))
+    exp = _revoked_tokens.get(jti)
+    return exp is not None and exp > time.time()
+
+
+def _revoke_token(jti, exp):
+    now = time.time()
+    r = _redis()
+    if r is not None:
+        r.setex(_REVOKED_KEY.format(jti), max(int(exp - now), 1), '1')
+        return
+    # Drop entries whose tokens have expired anyway
+    for stale in [k for k, v in _revoked_tokens.items() if v <= now]:
+        del _revoked_tokens[stale]
+    _revoked_tokens[jti] = exp
+
+
+# ── Verification cache ────────────────────────────────────
+# Short-lived cache of already-verified users: session checks keyed by JTI,
+# successful logins keyed by a hash of the credentials (never the plaintext).
+# A burst of identical requests skips the DB lookup and bcrypt entirely.
+_verified = TTLCache(maxsize=10_000, ttl=5)
+_verified_lock = threading.RLock()
+
+
+def _login_cache_key(researcher_id, password):
+    digest = hashlib.sha256(
+        researcher_id.encode('utf-8') + b'\0' + password.encode('utf-8')
+    ).hexdigest()
+    return ('login', digest)
+
+
+def _cache_get(key):
+    with _verified_lock:
+        return _verified.get(key)
+
+
+def _cache_put(key, user_dict):
+    with _verified_lock:
+        _verified[key] = user_dict
+
+
+def _cache_evict_user(user_id):
+    with _verified_lock:
+        for key in [k for k, v in _verified.items() if v['id'] == user_id]:
+            _verified.pop(key, None)
+
+
+# ── Bcrypt offload ────────────────────────────────────────
+# bcrypt is deliberately slow; run it on the app's bounded executor and cap
+# in-flight calls so a login flood gets a fast 503 instead of a deep queue.
+_bcrypt_slots = threading.BoundedSemaphore(os.cpu_count() or 2)
+BCRYPT_WAIT_SECONDS = 5
+
+
+def _run_bcrypt(fn, *args):
+    """Run a bcrypt call off the request thread; None if saturated."""
+    if not _bcrypt_slots.acquire(timeout=BCRYPT_WAIT_SECONDS):
+        return None
+    try:
+        return current_app.extensions['bcrypt_executor'].submit(fn, *args).result()
+    finally:
+        _bcrypt_slots.release()
+
+
+# ── Public key cache ──────────────────────────────────────
+# Kyber public keys only change via PUT /kyber-key, which invalidates them.
+# Shared through Redis when configured, otherwise cached per process.
+PUBKEY_TTL_SECONDS = 300
+_PUBKEY_KEY = 'pubkey:{}'
+_pubkeys = TTLCache(maxsize=10_000, ttl=PUBKEY_TTL_SECONDS)
+_pubkeys_lock = threading.Lock()
+
+
+def _pubkey_cache_get(researcher_id):
+    r = _redis()
+    if r is not None:
+        value = r.get(_PUBKEY_KEY.format(researcher_id))
+        return value.decode('utf-8') if value is not None else None
+    with _pubkeys_lock:
+        return _pubkeys.get(researcher_id)
+
+
+def _pubkey_cache_put(researcher_id, public_key):
+    r = _redis()
+    if r is not None:
+        r.setex(_PUBKEY_KEY.format(researcher_id), PUBKEY_TTL_SECONDS, public_key)
+        return
+    with _pubkeys_lock:
+        _pubkeys[researcher_id] = public_key
+
+
+def _pubkey_cache_evict(researcher_id):
+    r = _redis()
+    if r is not None:
+        r.delete(_PUBKEY_KEY.format(researcher_id))
+        return
+    with _pubkeys_lock:
+        _pubkeys.pop(researcher_id, None)
+
+
+# ── Password hashing ──────────────────────────────────────
+# Passwords are pre-hashed with keyed BLAKE2b so bcrypt always sees a fixed
+# 44-byte input, whatever the password length. Hashes from before this
+# scheme carry no prefix and are upgraded on the next successful login.
+_PREHASH_PREFIX = 'blake2b$'
+
+
+def _prehash(password):
+    pepper = current_app.config['PASSWORD_PEPPER'].encode('utf-8')
+    key = hashlib.blake2b(pepper).digest()
+    digest = hashlib.blake2b(password.encode('utf-8'), key=key, digest_size=32).digest()
+    return base64.b64encode(digest)
+
+
+def _hash_password(password):
+    """Return the value to store in password_hash, or None if saturated."""
+    hashed = _run_bcrypt(bcrypt.hashpw, _prehash(password), bcrypt.gensalt())
+    if hashed is None:
+        return None
+    return _PREHASH_PREFIX + hashed.decode('utf-8')
+
+
+def _check_password(password, stored):
+    """True/False for a match, or None if the bcrypt pool is saturated."""
+    if stored.startswith(_PREHASH_PREFIX):
+        return _run_bcrypt(bcrypt.checkpw, _prehash(password),
+                           stored[len(_PREHASH_PREFIX):].encode('utf-8'))
+    return _run_bcrypt(bcrypt.checkpw, password.encode('utf-8'), stored.encode('utf-8'))
 
 
 # Register the revocation checker via extension callback
@@ -46,10 +206,18 @@ def register():
     if len(password) < 6:
         return jsonify({'error': 'Password must be at least 6 characters'}), 400
 
-    if User.query.filter_by(researcher_id=researcher_id).first():
+    with read_only():
+        taken = db.session.query(
+            User.query.filter_by(researcher_id=researcher_id).exists()
+        ).scalar()
+    # Hand the connection back before bcrypt; the insert checks out a new one
+    db.session.close()
+    if taken:
         return jsonify({'error': 'Researcher ID already exists'}), 409
 
-    pw_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    pw_hash = _hash_password(password)
+    if pw_hash is None:
+        return jsonify({'error': 'Server busy, try again shortly'}), 503
 
     user = User(
         researcher_id=researcher_id,
@@ -68,6 +236,7 @@ def register():
 
 
 @auth_bp.route('/login', methods=['POST'])
+@limiter.limit('5 per minute', key_func=_login_rate_key)
 def login():
     """
     Authenticate with researcher ID + password.
@@ -80,24 +249,46 @@ def login():
     if not researcher_id or not password:
         return jsonify({'error': 'Researcher ID and password are required'}), 400
 
-    user = User.query.filter_by(researcher_id=researcher_id).first()
-    if not user or not bcrypt.checkpw(password.encode('utf-8'), user.password_hash.encode('utf-8')):
-        return jsonify({'error': 'Invalid credentials'}), 401
+    cache_key = _login_cache_key(researcher_id, password)
+    user_dict = _cache_get(cache_key)
+    if user_dict is None:
+        with read_only():
+            user = User.query.filter_by(researcher_id=researcher_id).first()
+        # Hand the connection back before bcrypt; the user stays loaded
+        db.session.close()
+        if not user:
+            return jsonify({'error': 'Invalid credentials'}), 401
+        ok = _check_password(password, user.password_hash)
+        if ok is None:
+            return jsonify({'error': 'Server busy, try again shortly'}), 503
+        if not ok:
+            return jsonify({'error': 'Invalid credentials'}), 401
+        if not user.password_hash.startswith(_PREHASH_PREFIX):
+            upgraded = _hash_password(password)
+            if upgraded is not None:
+                db.session.execute(
+                    update(User).where(User.id == user.id).values(password_hash=upgraded)
+                )
+                db.session.commit()
+        user_dict = user.to_dict()
+        _cache_put(cache_key, user_dict)
 
     token = create_access_token(
-        identity=str(user.id),
-        additional_claims={'rid': user.researcher_id, 'role': user.role}
+        identity=str(user_dict['id']),
+        additional_claims={'rid': user_dict['researcherId'], 'role': user_dict['role']}
     )
 
-    return jsonify({'token': token, 'user': user.to_dict()})
+    return jsonify({'token': token, 'user': user_dict})
 
 
 @auth_bp.route('/logout', methods=['POST'])
 @jwt_required()
 def logout():
     """Revoke the current JWT."""
-    jti = get_jwt()['jti']
-    _revoked_tokens.add(jti)
+    claims = get_jwt()
+    _revoke_token(claims['jti'], claims['exp'])
+    with _verified_lock:
+        _verified.pop(('session', claims['jti']), None)
     return jsonify({'message': 'Logged out successfully'})
 
 
@@ -105,11 +296,16 @@ def logout():
 @jwt_required()
 def session_check():
     """Validate current token and return user info."""
-    user_id = get_jwt_identity()
-    user = User.query.get(int(user_id))
-    if not user:
-        return jsonify({'error': 'User not found'}), 404
-    return jsonify({'user': user.to_dict()})
+    cache_key = ('session', get_jwt()['jti'])
+    user_dict = _cache_get(cache_key)
+    if user_dict is None:
+        user_id = get_jwt_identity()
+        user = db.session.get(User, int(user_id))
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        user_dict = user.to_dict()
+        _cache_put(cache_key, user_dict)
+    return jsonify({'user': user_dict})
 
 
 @auth_bp.route('/kyber-key', methods=['PUT'])
@@ -120,7 +316,7 @@ def update_kyber_key():
     Body: { kyberPublicKey: "<base64 string>" }
     """
     user_id = get_jwt_identity()
-    user = User.query.get(int(user_id))
+    user = db.session.get(User, int(user_id))
     if not user:
         return jsonify({'error': 'User not found'}), 404
 
@@ -131,6 +327,9 @@ def update_kyber_key():
 
     user.kyber_public_key = pk
     db.session.commit()
+    _cache_evict_user(user.id)
+    _pubkey_cache_evict(user.researcher_id)
+    evict_member_pubkeys(user.id)
 
     return jsonify({'message': 'Kyber public key updated', 'user': user.to_dict()})
 
@@ -139,7 +338,7 @@ def update_kyber_key():
 @jwt_required()
 def search_users():
     """
-    Search for researchers by ID (partial match).
+    Search for researchers by ID (case-insensitive prefix match).
     Query: ?q=<search_term>
     Returns researcher IDs and whether they have a Kyber public key.
     """
@@ -148,10 +347,18 @@ def search_users():
     if not q:
         return jsonify([])
 
-    users = User.query.filter(
-        User.researcher_id.ilike(f'%{q}%'),
-        User.id != int(current_user_id)
-    ).limit(20).all()
+    # Escape wildcards so q='%' stays a prefix lookup instead of matching all
+    pattern = q.replace('/', '//').replace('%', '/%').replace('_', '/_') + '%'
+    with read_only():
+        # SQLite's LIKE ignores ASCII case and can use the NOCASE index
+        if db.session.get_bind().dialect.name == 'sqlite':
+            match = User.researcher_id.like(pattern, escape='/')
+        else:
+            match = User.researcher_id.ilike(pattern, escape='/')
+        users = User.query.filter(
+            match,
+            User.id != int(current_user_id)
+        ).limit(20).all()
 
     return jsonify([{
         'id': u.id,
@@ -167,13 +374,18 @@ def get_pubkey(researcher_id):
     Retrieve a user's Kyber-512 public key by researcher ID.
     Used by the sender to encapsulate the AES key.
     """
-    user = User.query.filter_by(researcher_id=researcher_id).first()
-    if not user:
-        return jsonify({'error': 'User not found'}), 404
-    if not user.kyber_public_key:
-        return jsonify({'error': 'Recipient has no Kyber public key registered'}), 404
+    public_key = _pubkey_cache_get(researcher_id)
+    if public_key is None:
+        with read_only():
+            user = User.query.filter_by(researcher_id=researcher_id).first()
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        if not user.kyber_public_key:
+            return jsonify({'error': 'Recipient has no Kyber public key registered'}), 404
+        public_key = user.kyber_public_key
+        _pubkey_cache_put(researcher_id, public_key)
 
     return jsonify({
-        'researcherId': user.researcher_id,
-        'kyberPublicKey': user.kyber_public_key,
+        'researcherId': researcher_id,
+        'kyberPublicKey': public_key,
     })
@@ -5,18 +5,224 @@ Encrypted blobs are stored in the local /storage directory.
 
 import os
 import uuid
+import contextlib
 import hashlib
+from datetime import datetime, timezone
+from urllib.parse import unquote
 from flask import Blueprint, request, jsonify, send_file, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, FileMetadata, SharedAccess, FileHistory, User
+from werkzeug.wsgi import LimitedStream
+from sqlalchemy import or_, and_
+from sqlalchemy.orm import selectinload, raiseload
+from models import (
+    db, read_only, FileMetadata, SharedAccess, FileHistory, User,
+    GroupFileAccess, GroupMembership
+)
 
 files_bp = Blueprint('files', __name__)
 
+# SharedAccess.to_dict() reads file, sender and recipient: batch-load them
+# and turn any other lazy load in the listings into an error.
+_SHARE_LIST_LOADS = (
+    selectinload(SharedAccess.file),
+    selectinload(SharedAccess.sender),
+    selectinload(SharedAccess.recipient),
+    raiseload('*'),
+)
+
+# The file listing selects these columns as plain rows, labelled with the
+# FileMetadata.to_dict() keys, so no ORM instances are built per row.
+_FILE_LIST_COLUMNS = (
+    FileMetadata.id.label('id'),
+    FileMetadata.owner_id.label('ownerId'),
+    FileMetadata.file_name.label('fileName'),
+    FileMetadata.original_size.label('originalSize'),
+    FileMetadata.encrypted_size.label('encryptedSize'),
+    FileMetadata.content_type.label('contentType'),
+    FileMetadata.sha256_hash.label('sha256Hash'),
+    FileMetadata.created_at.label('createdAt'),
+)
+
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
 
 def _storage_dir():
     return current_app.config['STORAGE_DIR']
 
 
+def shard_dir(file_uuid):
+    """Two-level xx/yy/ fan-out (65,536 buckets) keeps directories small."""
+    return os.path.join(file_uuid[:2], file_uuid[2:4])
+
+
+def _page_params():
+    """
+    Parse keyset pagination params: ?cursor=<createdAt ISO>|<id>&limit=N.
+    Returns ((created_at, id) or None, limit), or None if malformed.
+    """
+    try:
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+        cursor = request.args.get('cursor')
+        if cursor:
+            stamp, _, row_id = cursor.rpartition('|')
+            stamp = datetime.fromisoformat(stamp)
+            if stamp.tzinfo is not None:
+                # Timestamps are stored as naive UTC
+                stamp = stamp.astimezone(timezone.utc).replace(tzinfo=None)
+            cursor = (stamp, int(row_id))
+        else:
+            cursor = None
+    except ValueError:
+        return None
+    return cursor, max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def _fetch_page(query, column, id_column, cursor, limit, cursor_attr=None):
+    """
+    Fetch one page newest-first, ordered by (column, id_column) so rows
+    sharing a timestamp are neither skipped nor repeated across pages.
+    Returns (rows, nextCursor or None). cursor_attr names the attribute
+    holding `column` on each row when it was selected under a label; the
+    id is read from `id`.
+    """
+    if cursor is not None:
+        stamp, row_id = cursor
+        query = query.filter(or_(
+            column < stamp,
+            and_(column == stamp, id_column < row_id),
+        ))
+    rows = query.order_by(column.desc(), id_column.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, f'{getattr(last, cursor_attr or column.key).isoformat()}|{last.id}'
+
+
+def _load_readable_file(file_id, user_id):
+    """
+    Fetch a file and whether user_id may read it (owner, direct share or
+    group access) in a single statement. Returns (meta, allowed) or None.
+    """
+    shared = db.select(SharedAccess.id).where(
+        SharedAccess.file_id == FileMetadata.id,
+        SharedAccess.recipient_id == user_id,
+    ).exists()
+    via_group = db.select(GroupFileAccess.id).join(
+        GroupMembership, GroupFileAccess.group_id == GroupMembership.group_id
+    ).where(
+        GroupFileAccess.file_id == FileMetadata.id,
+        GroupMembership.user_id == user_id,
+    ).exists()
+    return db.session.query(
+        FileMetadata,
+        or_(FileMetadata.owner_id == user_id, shared, via_group),
+    ).filter(FileMetadata.id == file_id).first()
+
+
+def _blob_response(meta, full_path, **send_kwargs):
+    """
+    Build the response carrying an encrypted blob.
+    With STORAGE_ACCEL_PREFIX set, nginx serves the file itself via
+    X-Accel-Redirect (sendfile, no Python in the data path). Otherwise
+    send_file is used, which honours USE_X_SENDFILE for Apache/lighttpd.
+    """
+    accel_prefix = current_app.config.get('STORAGE_ACCEL_PREFIX')
+    if accel_prefix:
+        response = current_app.response_class(mimetype='application/octet-stream')
+        response.headers['X-Accel-Redirect'] = (
+            accel_prefix.rstrip('/') + '/' + meta.storage_path.replace(os.sep, '/')
+        )
+        return response
+    return send_file(full_path, mimetype='application/octet-stream', **send_kwargs)
+
+
+def _iter_chunks(stream):
+    """
+    Yield successive chunks of an upload stream.
+    File objects with readinto() (the multipart spool) reuse one
+    preallocated buffer (the same loop hashlib.file_digest runs), so no
+    bytes object is allocated per chunk. Werkzeug's LimitedStream is read
+    with read(): its readinto() cannot fill a memoryview, which would turn
+    a client disconnect into a ValueError.
+    """
+    readinto = getattr(stream, 'readinto', None)
+    if readinto is None or isinstance(stream, LimitedStream):
+        while chunk := stream.read(UPLOAD_CHUNK_SIZE):
+            yield chunk
+        return
+    view = memoryview(bytearray(UPLOAD_CHUNK_SIZE))
+    while n := readinto(view):
+        yield view[:n]
+
+
+def _write_blob(stream, full_path, compute_hash=True):
+    """
+    Copy an upload stream to disk in a single pass, hashing as it goes.
+    Returns (bytes_written, sha256 hex digest or None).
+    """
+    h = hashlib.sha256(usedforsecurity=True) if compute_hash else None
+    size = 0
+    fd = os.open(full_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    with os.fdopen(fd, 'wb', buffering=UPLOAD_CHUNK_SIZE) as out:
+        for chunk in _iter_chunks(stream):
+            if h is not None:
+                h.update(chunk)
+            out.write(chunk)
+            size += len(chunk)
+    return size, (h.hexdigest() if h is not None else None)
+
+
+def _store_upload(user_id, stream, file_name, original_size, iv,
+                  sha256_hash, content_type):
+    """Write an uploaded blob to storage and record its metadata + history."""
+    # Generate unique storage path
+    file_uuid = uuid.uuid4().hex
+    storage_filename = f'{file_uuid}.enc'
+    rel_path = os.path.join(shard_dir(file_uuid), storage_filename)
+    full_path = os.path.join(_storage_dir(), rel_path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+
+    try:
+        # Stream to disk, hashing in the same pass if the client sent no hash
+        encrypted_size, computed_hash = _write_blob(
+            stream, full_path, compute_hash=not sha256_hash
+        )
+        sha256_hash = sha256_hash or computed_hash
+
+        # Save metadata
+        meta = FileMetadata(
+            owner_id=user_id,
+            file_name=file_name,
+            original_size=original_size,
+            encrypted_size=encrypted_size,
+            storage_path=rel_path,
+            content_type=content_type,
+            sha256_hash=sha256_hash,
+            iv=iv,
+        )
+        # Also add to history
+        hist = FileHistory(
+            user_id=user_id,
+            name=file_name,
+            original_size=original_size,
+            encrypted_size=encrypted_size,
+            file_type=content_type,
+            operation='encrypt',
+        )
+        db.session.add_all([meta, hist])
+        db.session.commit()
+    except BaseException:
+        # A disconnect, size limit or failed commit must not leave an
+        # orphaned partial blob behind
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(full_path)
+        raise
+    return meta
+
+
 # ── Upload encrypted file ─────────────────────────────────
 
 @files_bp.route('/upload', methods=['POST'])
@@ -37,73 +243,56 @@ def upload_file():
         return jsonify({'error': 'No file provided'}), 400
 
     uploaded = request.files['file']
-    file_name = request.form.get('fileName', uploaded.filename or 'unnamed')
-    original_size = int(request.form.get('originalSize', 0))
-    iv = request.form.get('iv', '')
-    sha256_hash = request.form.get('sha256Hash', '')
-    content_type = request.form.get('contentType', 'application/octet-stream')
+    meta = _store_upload(
+        user_id,
+        uploaded.stream,
+        file_name=request.form.get('fileName', uploaded.filename or 'unnamed'),
+        original_size=int(request.form.get('originalSize', 0)),
+        iv=request.form.get('iv', ''),
+        sha256_hash=request.form.get('sha256Hash', ''),
+        content_type=request.form.get('contentType', 'application/octet-stream'),
+    )
+    return jsonify(meta.to_dict()), 201
 
-    # Generate unique storage path
-    file_uuid = uuid.uuid4().hex
-    storage_subdir = os.path.join(_storage_dir(), file_uuid[:2])
-    os.makedirs(storage_subdir, exist_ok=True)
-    storage_filename = f'{file_uuid}.enc'
-    full_path = os.path.join(storage_subdir, storage_filename)
 
-    # Save to disk
-    uploaded.save(full_path)
-    encrypted_size = os.path.getsize(full_path)
+@files_bp.route('/upload-raw', methods=['POST'])
+@jwt_required()
+def upload_file_raw():
+    """
+    Accept an encrypted file blob as the raw request body.
+    Skips multipart parsing entirely; the body is streamed straight to disk.
+    Headers (or the equivalent query parameters):
+      - X-File-Name / fileName: original file name (URL-encoded)
+      - X-Original-Size / originalSize: original unencrypted size in bytes
+      - X-IV / iv: base64-encoded AES-GCM IV (optional)
+      - X-SHA256 / sha256Hash: hex string of encrypted payload hash (optional)
+      - X-Content-Type / contentType: original MIME type (optional)
+    """
+    user_id = int(get_jwt_identity())
 
-    # Compute hash if not provided
-    if not sha256_hash:
-        h = hashlib.sha256()
-        with open(full_path, 'rb') as f:
-            for chunk in iter(lambda: f.read(8192), b''):
-                h.update(chunk)
-        sha256_hash = h.hexdigest()
+    if request.content_length == 0:
+        return jsonify({'error': 'No file provided'}), 400
 
-    # Save metadata
-    rel_path = os.path.join(file_uuid[:2], storage_filename)
-    meta = FileMetadata(
-        owner_id=user_id,
-        file_name=file_name,
-        original_size=original_size,
-        encrypted_size=encrypted_size,
-        storage_path=rel_path,
-        content_type=content_type,
-        sha256_hash=sha256_hash,
-        iv=iv,
-    )
-    db.session.add(meta)
+    def field(header, param, default=''):
+        return request.headers.get(header) or request.args.get(param, default)
 
-    # Also add to history
-    hist = FileHistory(
-        user_id=user_id,
-        name=file_name,
+    try:
+        original_size = int(field('X-Original-Size', 'originalSize', 0))
+    except ValueError:
+        return jsonify({'error': 'Invalid original size'}), 400
+
+    meta = _store_upload(
+        user_id,
+        request.stream,
+        file_name=unquote(field('X-File-Name', 'fileName', 'unnamed')),
         original_size=original_size,
-        encrypted_size=encrypted_size,
-        file_type=content_type,
-        operation='encrypt',
+        iv=field('X-IV', 'iv'),
+        sha256_hash=field('X-SHA256', 'sha256Hash'),
+        content_type=field('X-Content-Type', 'contentType', 'application/octet-stream'),
     )
-    db.session.add(hist)
-    db.session.commit()
-
     return jsonify(meta.to_dict()), 201
 
 
-# ── List my files (owned) ──────────────────────────────────
-
-@files_bp.route('/my-files', methods=['GET'])
-@jwt_required()
-def my_files():
-    """Return all files owned by the current user."""
-    user_id = int(get_jwt_identity())
-    files = FileMetadata.query.filter_by(owner_id=user_id).order_by(
-        FileMetadata.created_at.desc()
-    ).all()
-    return jsonify([f.to_dict() for f in files])
-
-
 # ── Download encrypted file ───────────────────────────────
 
 @files_bp.route('/download/<int:file_id>', methods=['GET'])
@@ -111,37 +300,24 @@ def my_files():
 def download_file(file_id):
     """
     Download an encrypted file blob.
-    The requester must be the owner OR have a SharedAccess record.
+    The requester must be the owner, have a SharedAccess record, or
+    belong to a group the file was shared with.
     """
     user_id = int(get_jwt_identity())
-    meta = FileMetadata.query.get(file_id)
-    if not meta:
+    row = _load_readable_file(file_id, user_id)
+    if not row:
         return jsonify({'error': 'File not found'}), 404
-
-    # Authorization: owner, valid share, or group access
-    if meta.owner_id != user_id:
-        share = SharedAccess.query.filter_by(
-            file_id=file_id, recipient_id=user_id
-        ).first()
-        group_access = None
-        if not share:
-            from models import GroupFileAccess, GroupMembership
-            group_access = db.session.query(GroupFileAccess).join(
-                GroupMembership, GroupFileAccess.group_id == GroupMembership.group_id
-            ).filter(
-                GroupFileAccess.file_id == file_id,
-                GroupMembership.user_id == user_id
-            ).first()
-        if not share and not group_access:
-            return jsonify({'error': 'Access denied'}), 403
+    meta, allowed = row
+    if not allowed:
+        return jsonify({'error': 'Access denied'}), 403
 
     full_path = os.path.join(_storage_dir(), meta.storage_path)
     if not os.path.exists(full_path):
         return jsonify({'error': 'File blob not found on storage'}), 404
 
-    response = send_file(
+    response = _blob_response(
+        meta,
         full_path,
-        mimetype='application/octet-stream',
         as_attachment=True,
         download_name=meta.file_name + '.enc'
     )
@@ -165,36 +341,18 @@ def view_file(file_id):
     Returns the raw encrypted blob with original content-type metadata in headers.
     """
     user_id = int(get_jwt_identity())
-    meta = FileMetadata.query.get(file_id)
-    if not meta:
+    row = _load_readable_file(file_id, user_id)
+    if not row:
         return jsonify({'error': 'File not found'}), 404
-
-    # Authorization: owner or valid share
-    if meta.owner_id != user_id:
-        share = SharedAccess.query.filter_by(
-            file_id=file_id, recipient_id=user_id
-        ).first()
-        # Also check group access
-        group_access = None
-        if not share:
-            from models import GroupFileAccess, GroupMembership
-            group_access = db.session.query(GroupFileAccess).join(
-                GroupMembership, GroupFileAccess.group_id == GroupMembership.group_id
-            ).filter(
-                GroupFileAccess.file_id == file_id,
-                GroupMembership.user_id == user_id
-            ).first()
-        if not share and not group_access:
-            return jsonify({'error': 'Access denied'}), 403
+    meta, allowed = row
+    if not allowed:
+        return jsonify({'error': 'Access denied'}), 403
 
     full_path = os.path.join(_storage_dir(), meta.storage_path)
     if not os.path.exists(full_path):
         return jsonify({'error': 'File blob not found on storage'}), 404
 
-    response = send_file(
-        full_path,
-        mimetype='application/octet-stream',
-    )
+    response = _blob_response(meta, full_path)
     response.headers['Content-Type'] = 'application/octet-stream'
     response.headers['X-Original-Filename'] = meta.file_name
     response.headers['X-Content-Type'] = meta.content_type
@@ -211,7 +369,7 @@ def view_file(file_id):
 def file_meta(file_id):
     """Get metadata for a single file."""
     user_id = int(get_jwt_identity())
-    meta = FileMetadata.query.get(file_id)
+    meta = db.session.get(FileMetadata, file_id)
     if not meta:
         return jsonify({'error': 'File not found'}), 404
     if meta.owner_id != user_id:
@@ -247,7 +405,7 @@ def share_file():
         return jsonify({'error': 'fileId, recipientId, and kemCiphertext are required'}), 400
 
     # Validate file ownership
-    meta = FileMetadata.query.get(file_id)
+    meta = db.session.get(FileMetadata, file_id)
     if not meta or meta.owner_id != user_id:
         return jsonify({'error': 'File not found or access denied'}), 404
 
@@ -267,8 +425,6 @@ def share_file():
         share_code=share_code,
         permission=permission,
     )
-    db.session.add(share)
-
     # Log
     hist = FileHistory(
         user_id=user_id,
@@ -278,7 +434,7 @@ def share_file():
         file_type='share',
         operation='share',
     )
-    db.session.add(hist)
+    db.session.add_all([share, hist])
     db.session.commit()
 
     return jsonify(share.to_dict()), 201
@@ -290,10 +446,15 @@ def share_file():
 @jwt_required()
 def list_shared():
     user_id = int(get_jwt_identity())
-    shares = SharedAccess.query.filter_by(sender_id=user_id).order_by(
-        SharedAccess.created_at.desc()
-    ).all()
-    return jsonify([s.to_dict() for s in shares])
+    page = _page_params()
+    if page is None:
+        return jsonify({'error': 'Invalid cursor or limit'}), 400
+    with read_only():
+        shares, next_cursor = _fetch_page(
+            SharedAccess.query.options(*_SHARE_LIST_LOADS).filter_by(sender_id=user_id),
+            SharedAccess.created_at, SharedAccess.id, *page
+        )
+    return jsonify({'items': [s.to_dict() for s in shares], 'nextCursor': next_cursor})
 
 
 # ── List files shared with me (received) ──────────────────
@@ -302,10 +463,15 @@ def list_shared():
 @jwt_required()
 def list_received():
     user_id = int(get_jwt_identity())
-    shares = SharedAccess.query.filter_by(recipient_id=user_id).order_by(
-        SharedAccess.created_at.desc()
-    ).all()
-    return jsonify([s.to_dict() for s in shares])
+    page = _page_params()
+    if page is None:
+        return jsonify({'error': 'Invalid cursor or limit'}), 400
+    with read_only():
+        shares, next_cursor = _fetch_page(
+            SharedAccess.query.options(*_SHARE_LIST_LOADS).filter_by(recipient_id=user_id),
+            SharedAccess.created_at, SharedAccess.id, *page
+        )
+    return jsonify({'items': [s.to_dict() for s in shares], 'nextCursor': next_cursor})
 
 
 # ── Get share details (for downloading shared file) ───────
@@ -340,7 +506,7 @@ def get_share_by_code(share_code):
 @jwt_required()
 def revoke_share(share_id):
     user_id = int(get_jwt_identity())
-    share = SharedAccess.query.get(share_id)
+    share = db.session.get(SharedAccess, share_id)
     if not share or share.sender_id != user_id:
         return jsonify({'error': 'Not found'}), 404
     db.session.delete(share)
@@ -354,28 +520,34 @@ def revoke_share(share_id):
 @jwt_required()
 def get_history():
     user_id = int(get_jwt_identity())
-    items = FileHistory.query.filter_by(user_id=user_id).order_by(
-        FileHistory.timestamp.desc()
-    ).limit(100).all()
+    with read_only():
+        items = FileHistory.query.filter_by(user_id=user_id).order_by(
+            FileHistory.timestamp.desc()
+        ).limit(100).all()
     return jsonify([i.to_dict() for i in items])
 
 
 @files_bp.route('/history', methods=['POST'])
 @jwt_required()
 def add_history():
+    """
+    Record a client-side operation in the audit log.
+    The row is written asynchronously in a batch, so the response is
+    202 and carries no id.
+    """
     user_id = int(get_jwt_identity())
     data = request.get_json(silent=True) or {}
-    entry = FileHistory(
-        user_id=user_id,
-        name=data.get('name', 'Unnamed'),
-        original_size=int(data.get('originalSize', 0)),
-        encrypted_size=int(data.get('encryptedSize', 0)),
-        file_type=data.get('type', 'unknown'),
-        operation=data.get('operation', 'encrypt'),
-    )
-    db.session.add(entry)
-    db.session.commit()
-    return jsonify(entry.to_dict()), 201
+    row = {
+        'user_id': user_id,
+        'name': data.get('name', 'Unnamed'),
+        'original_size': int(data.get('originalSize', 0)),
+        'encrypted_size': int(data.get('encryptedSize', 0)),
+        'file_type': data.get('type', 'unknown'),
+        'operation': data.get('operation', 'encrypt'),
+        'timestamp': datetime.now(timezone.utc),
+    }
+    current_app.extensions['history_writer'].submit(row)
+    return jsonify(FileHistory(**row).to_dict()), 202
 
 
 @files_bp.route('/history/<int:item_id>', methods=['DELETE'])
@@ -404,8 +576,14 @@ def clear_history():
 @files_bp.route('/my-files', methods=['GET'])
 @jwt_required()
 def list_my_files():
+    """Return the current user's files, newest first, one page at a time."""
     user_id = int(get_jwt_identity())
-    files = FileMetadata.query.filter_by(owner_id=user_id).order_by(
-        FileMetadata.created_at.desc()
-    ).all()
-    return jsonify([f.to_dict() for f in files])
+    page = _page_params()
+    if page is None:
+        return jsonify({'error': 'Invalid cursor or limit'}), 400
+    with read_only():
+        rows, next_cursor = _fetch_page(
+            db.session.query(*_FILE_LIST_COLUMNS).filter(FileMetadata.owner_id == user_id),
+            FileMetadata.created_at, FileMetadata.id, *page, cursor_attr='createdAt'
+        )
+    return jsonify({'items': [dict(r._mapping) for r in rows], 'nextCursor': next_cursor})
@@ -3,16 +3,224 @@ Group management routes — create groups, manage members, share files with grou
 Supports post-quantum group-level file sharing via per-member KEM ciphertexts.
 """
 
-import json
-from flask import Blueprint, request, jsonify
+import threading
+from datetime import datetime, timezone
+import orjson
+from cachetools import TTLCache
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import or_, case, exists, func, insert, lambda_stmt, select
+from sqlalchemy.orm import selectinload, contains_eager
 from models import (
-    db, User, Group, GroupMembership, GroupFileAccess,
-    FileMetadata, FileHistory
+    db, read_only, upsert_insert, User, Group, GroupMembership, GroupFileAccess,
+    GroupFileAccessCiphertext, FileMetadata
 )
 
 groups_bp = Blueprint('groups', __name__)
 
+MAX_BULK_SHARES = 200
+
+# Exactly what the client renders for a group-shared file, plus what it
+# needs to decrypt it
+_GROUP_SHARE_COLUMNS = (
+    GroupFileAccess.id.label('id'),
+    GroupFileAccess.file_id.label('fileId'),
+    FileMetadata.file_name.label('fileName'),
+    GroupFileAccess.group_id.label('groupId'),
+    Group.name.label('groupName'),
+    User.researcher_id.label('sharedBy'),
+    GroupFileAccess.created_at.label('createdAt'),
+    GroupFileAccessCiphertext.ciphertext.label('myKemCiphertext'),
+    FileMetadata.iv.label('iv'),
+    FileMetadata.content_type.label('contentType'),
+    FileMetadata.original_size.label('originalSize'),
+)
+
+
+# ── Response cache ────────────────────────────────────────
+# Group lists and member key sets are read on every navigation and before
+# each encapsulation but change rarely. Cached briefly (Redis when
+# configured, else per process) and evicted by every mutating route.
+
+GROUP_CACHE_TTL_SECONDS = 30
+_GROUP_LIST_KEY = 'groups:{}'
+_GROUP_PUBKEYS_KEY = 'group-pubkeys:{}'
+_group_cache = TTLCache(maxsize=10_000, ttl=GROUP_CACHE_TTL_SECONDS)
+_group_cache_lock = threading.Lock()
+
+
+def _redis():
+    return current_app.extensions.get('redis')
+
+
+def _group_cache_get(key):
+    r = _redis()
+    if r is not None:
+        value = r.get(key)
+        return orjson.loads(value) if value is not None else None
+    with _group_cache_lock:
+        return _group_cache.get(key)
+
+
+def _group_cache_put(key, value):
+    r = _redis()
+    if r is not None:
+        r.setex(key, GROUP_CACHE_TTL_SECONDS, orjson.dumps(value, option=orjson.OPT_NAIVE_UTC))
+        return
+    with _group_cache_lock:
+        _group_cache[key] = value
+
+
+def _group_cache_evict(keys):
+    if not keys:
+        return
+    r = _redis()
+    if r is not None:
+        r.delete(*keys)
+        return
+    with _group_cache_lock:
+        for key in keys:
+            _group_cache.pop(key, None)
+
+
+def _group_audience(group_id):
+    """User ids whose group list shows this group: its members and owner."""
+    members = db.session.query(GroupMembership.user_id).filter_by(group_id=group_id)
+    owner = db.session.query(Group.owner_id).filter_by(id=group_id)
+    return [uid for (uid,) in members.union(owner)]
+
+
+def _evict_group_caches(group_id, user_ids):
+    """Drop the group's key set and the group lists of user_ids."""
+    _group_cache_evict(
+        [_GROUP_PUBKEYS_KEY.format(group_id)]
+        + [_GROUP_LIST_KEY.format(uid) for uid in set(user_ids)]
+    )
+
+
+def evict_member_pubkeys(user_id):
+    """Drop cached key sets of every group user_id belongs to (key rotation)."""
+    group_ids = db.session.query(GroupMembership.group_id).filter_by(user_id=user_id)
+    _group_cache_evict([_GROUP_PUBKEYS_KEY.format(gid) for (gid,) in group_ids])
+
+
+def _parse_share(item):
+    """
+    Validate and normalize one { fileId, kemCiphertexts } share payload.
+    Returns (file_id, { user_id: ciphertext }) with integer ids, or None.
+    The body itself is already decoded by the orjson JSON provider.
+    """
+    file_id = item.get('fileId')
+    kem_cts = item.get('kemCiphertexts')
+    if isinstance(file_id, str) and file_id.isdecimal():
+        file_id = int(file_id)
+    if not isinstance(file_id, int) or isinstance(file_id, bool) or file_id <= 0:
+        return None
+    if not isinstance(kem_cts, dict) or not kem_cts:
+        return None
+    if not all(uid.isdecimal() and isinstance(ct, str) and ct for uid, ct in kem_cts.items()):
+        return None
+    return file_id, {int(uid): ct for uid, ct in kem_cts.items()}
+
+
+def _non_members(group_id, user_ids):
+    """The ids in user_ids that are not members of the group, sorted."""
+    members = db.session.query(GroupMembership.user_id).filter(
+        GroupMembership.group_id == group_id,
+        GroupMembership.user_id.in_(user_ids),
+    )
+    return sorted(set(user_ids) - {uid for (uid,) in members})
+
+
+def _upsert_group_shares(group_id, user_id, shares):
+    """
+    Insert or refresh GroupFileAccess rows for [(FileMetadata, kem_cts), ...],
+    where kem_cts is a normalized { user_id: ciphertext } mapping (_parse_share),
+    with a single multi-row INSERT ... ON CONFLICT, replace their per-member
+    ciphertext rows with one executemany INSERT, and commit.
+    Returns [(share dict, created), ...] in input order, serialized before the
+    commit expires the rows. History rows for newly shared files are handed
+    to the background writer.
+    """
+    now = datetime.now(timezone.utc)
+    # Decide new vs refreshed up front: comparing created_at against `now`
+    # breaks wherever the driver shifts the stored timestamp.
+    existing = set(db.session.scalars(
+        select(GroupFileAccess.file_id).where(
+            GroupFileAccess.group_id == group_id,
+            GroupFileAccess.file_id.in_([meta.id for meta, _ in shares]),
+        )
+    ))
+    stmt = upsert_insert(GroupFileAccess).values([
+        {
+            'file_id': meta.id,
+            'group_id': group_id,
+            'shared_by': user_id,
+            'kem_ciphertexts': '{}',
+            'created_at': now,
+        }
+        for meta, _ in shares
+    ])
+    # The update clears any legacy blob and lets RETURNING yield existing rows
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['file_id', 'group_id'],
+        set_={'kem_ciphertexts': stmt.excluded.kem_ciphertexts},
+    ).returning(GroupFileAccess)
+    by_file = {
+        gfa.file_id: gfa
+        for gfa in db.session.scalars(stmt, execution_options={'populate_existing': True})
+    }
+
+    results, history, ciphertexts, refreshed = [], [], [], []
+    for meta, kem_cts in shares:
+        gfa = by_file[meta.id]
+        # Only new shares are logged
+        created = meta.id not in existing
+        results.append((gfa.to_dict(), created))
+        if not created:
+            refreshed.append(gfa.id)
+        ciphertexts.extend(
+            {'access_id': gfa.id, 'user_id': uid, 'ciphertext': ct}
+            for uid, ct in kem_cts.items()
+        )
+        if created:
+            history.append({
+                'user_id': user_id,
+                'name': meta.file_name,
+                'original_size': meta.original_size,
+                'encrypted_size': meta.encrypted_size,
+                'file_type': 'group-share',
+                'operation': 'share',
+                'timestamp': now,
+            })
+
+    if refreshed:
+        db.session.execute(db.delete(GroupFileAccessCiphertext).where(
+            GroupFileAccessCiphertext.access_id.in_(refreshed)
+        ))
+    db.session.execute(insert(GroupFileAccessCiphertext), ciphertexts)
+    db.session.commit()
+
+    writer = current_app.extensions['history_writer']
+    for row in history:
+        writer.submit(row)
+    return results
+
+
+def _load_group_and_role(group_id, user_id):
+    """
+    Fetch a group and the caller's membership (or None) in one round-trip.
+    Returns (group, membership), or None if the group does not exist.
+    Runs on every group-scoped request, so the statement is a lambda_stmt:
+    built and compiled once, with only the two ids bound per call.
+    """
+    stmt = lambda_stmt(lambda: select(Group, GroupMembership).outerjoin(
+        GroupMembership,
+        (GroupMembership.group_id == Group.id) & (GroupMembership.user_id == user_id),
+    ).where(Group.id == group_id))
+    with read_only():
+        return db.session.execute(stmt).first()
+
 
 # ── List my groups ────────────────────────────────────────
 
@@ -21,28 +229,31 @@ groups_bp = Blueprint('groups', __name__)
 def list_groups():
     """List all groups the user owns or is a member of."""
     user_id = int(get_jwt_identity())
-
-    # Groups I own
-    owned = Group.query.filter_by(owner_id=user_id).all()
-    owned_ids = {g.id for g in owned}
-
-    # Groups I'm a member of (but don't own)
-    memberships = GroupMembership.query.filter_by(user_id=user_id).all()
-    member_group_ids = {m.group_id for m in memberships if m.group_id not in owned_ids}
-    member_groups = Group.query.filter(Group.id.in_(member_group_ids)).all() if member_group_ids else []
-
-    all_groups = owned + member_groups
-    result = []
-    for g in all_groups:
-        d = g.to_dict()
-        d['isOwner'] = g.owner_id == user_id
-        # Find user's role
-        membership = GroupMembership.query.filter_by(
-            group_id=g.id, user_id=user_id
-        ).first()
-        d['myRole'] = membership.role if membership else ('admin' if g.owner_id == user_id else 'member')
-        result.append(d)
-
+    cache_key = _GROUP_LIST_KEY.format(user_id)
+    cached = _group_cache_get(cache_key)
+    if cached is not None:
+        return jsonify(cached)
+
+    with read_only():
+        # Groups I own or am a member of, with my ownership and role computed in SQL
+        is_owner = (Group.owner_id == user_id).label('is_owner')
+        my_role = func.coalesce(
+            GroupMembership.role,
+            case((Group.owner_id == user_id, 'admin'), else_='member'),
+        ).label('my_role')
+        rows = db.session.query(Group, is_owner, my_role).outerjoin(
+            GroupMembership,
+            (GroupMembership.group_id == Group.id) & (GroupMembership.user_id == user_id),
+        ).options(selectinload(Group.owner)).filter(
+            or_(Group.owner_id == user_id, GroupMembership.id.isnot(None))
+        ).order_by(is_owner.desc(), Group.created_at, Group.id)
+
+        result = [
+            {**g.to_dict(), 'isOwner': bool(owner), 'myRole': role}
+            for g, owner, role in rows
+        ]
+
+    _group_cache_put(cache_key, result)
     return jsonify(result)
 
 
@@ -84,6 +295,7 @@ def create_group():
     )
     db.session.add(membership)
     db.session.commit()
+    _evict_group_caches(group.id, [user_id])
 
     result = group.to_dict()
     result['isOwner'] = True
@@ -98,25 +310,32 @@ def create_group():
 def get_group(group_id):
     """Get details of a specific group including members."""
     user_id = int(get_jwt_identity())
-    group = Group.query.get(group_id)
-    if not group:
+    row = _load_group_and_role(group_id, user_id)
+    if not row:
         return jsonify({'error': 'Group not found'}), 404
 
-    # Check membership
-    membership = GroupMembership.query.filter_by(
-        group_id=group_id, user_id=user_id
-    ).first()
+    group, membership = row
     if not membership and group.owner_id != user_id:
         return jsonify({'error': 'Access denied'}), 403
 
-    result = group.to_dict()
-    result['isOwner'] = group.owner_id == user_id
-    result['myRole'] = membership.role if membership else 'admin'
-    result['members'] = [m.to_dict() for m in group.members.all()]
-
-    # Include shared files for this group
-    file_accesses = GroupFileAccess.query.filter_by(group_id=group_id).all()
-    result['sharedFiles'] = [fa.to_dict() for fa in file_accesses]
+    with read_only():
+        # Members with their users in one join; the owner is a member, so
+        # group.owner then resolves from the identity map
+        members = GroupMembership.query.join(GroupMembership.user).options(
+            contains_eager(GroupMembership.user)
+        ).filter(GroupMembership.group_id == group_id).all()
+
+        result = group.to_dict()
+        result['isOwner'] = group.owner_id == user_id
+        result['myRole'] = membership.role if membership else 'admin'
+        result['members'] = [m.to_dict() for m in members]
+
+        # Include shared files for this group
+        file_accesses = GroupFileAccess.query.filter_by(group_id=group_id).options(
+            selectinload(GroupFileAccess.file),
+            selectinload(GroupFileAccess.sharer),
+        ).all()
+        result['sharedFiles'] = [fa.to_dict() for fa in file_accesses]
 
     return jsonify(result)
 
@@ -132,14 +351,12 @@ def add_member(group_id):
     Only group owner or admin can add members.
     """
     user_id = int(get_jwt_identity())
-    group = Group.query.get(group_id)
-    if not group:
+    row = _load_group_and_role(group_id, user_id)
+    if not row:
         return jsonify({'error': 'Group not found'}), 404
 
     # Check admin permission
-    membership = GroupMembership.query.filter_by(
-        group_id=group_id, user_id=user_id
-    ).first()
+    group, membership = row
     if not membership or membership.role != 'admin':
         if group.owner_id != user_id:
             return jsonify({'error': 'Only admins can add members'}), 403
@@ -154,15 +371,19 @@ def add_member(group_id):
     if role not in ('admin', 'member'):
         return jsonify({'error': 'Role must be admin or member'}), 400
 
-    target_user = User.query.filter_by(researcher_id=researcher_id).first()
-    if not target_user:
+    # Resolve the user and whether they already belong, in one query
+    row = db.session.query(
+        User,
+        exists().where(
+            GroupMembership.group_id == group_id,
+            GroupMembership.user_id == User.id,
+        ).label('is_member'),
+    ).filter(User.researcher_id == researcher_id).first()
+    if not row:
         return jsonify({'error': 'User not found'}), 404
 
-    # Check if already a member
-    existing = GroupMembership.query.filter_by(
-        group_id=group_id, user_id=target_user.id
-    ).first()
-    if existing:
+    target_user, is_member = row
+    if is_member:
         return jsonify({'error': 'User is already a member'}), 409
 
     new_member = GroupMembership(
@@ -172,6 +393,7 @@ def add_member(group_id):
     )
     db.session.add(new_member)
     db.session.commit()
+    _evict_group_caches(group_id, _group_audience(group_id))
 
     return jsonify(new_member.to_dict()), 201
 
@@ -186,30 +408,31 @@ def remove_member(group_id, member_user_id):
     Only the owner/admin or the user themselves can remove.
     """
     user_id = int(get_jwt_identity())
-    group = Group.query.get(group_id)
-    if not group:
+    row = _load_group_and_role(group_id, user_id)
+    if not row:
         return jsonify({'error': 'Group not found'}), 404
 
     # Can't remove the owner
+    group, my_membership = row
     if member_user_id == group.owner_id:
         return jsonify({'error': 'Cannot remove the group owner'}), 400
 
     # Permission check: must be admin/owner or removing self
     if member_user_id != user_id:
-        my_membership = GroupMembership.query.filter_by(
-            group_id=group_id, user_id=user_id
-        ).first()
         if (not my_membership or my_membership.role != 'admin') and group.owner_id != user_id:
             return jsonify({'error': 'Only admins can remove members'}), 403
 
-    target_membership = GroupMembership.query.filter_by(
-        group_id=group_id, user_id=member_user_id
-    ).first()
-    if not target_membership:
+    removed = db.session.execute(
+        db.delete(GroupMembership).where(
+            GroupMembership.group_id == group_id,
+            GroupMembership.user_id == member_user_id,
+        )
+    ).rowcount
+    if not removed:
         return jsonify({'error': 'Member not found'}), 404
 
-    db.session.delete(target_membership)
     db.session.commit()
+    _evict_group_caches(group_id, _group_audience(group_id) + [member_user_id])
     return jsonify({'message': 'Member removed'})
 
 
@@ -227,60 +450,85 @@ def share_file_with_group(group_id):
     The client encapsulates the AES key for each group member's Kyber public key.
     """
     user_id = int(get_jwt_identity())
-    group = Group.query.get(group_id)
-    if not group:
+    row = _load_group_and_role(group_id, user_id)
+    if not row:
         return jsonify({'error': 'Group not found'}), 404
 
-    # Check membership
-    membership = GroupMembership.query.filter_by(
-        group_id=group_id, user_id=user_id
-    ).first()
+    group, membership = row
     if not membership and group.owner_id != user_id:
         return jsonify({'error': 'You are not a member of this group'}), 403
 
     data = request.get_json(silent=True) or {}
-    file_id = data.get('fileId')
-    kem_cts = data.get('kemCiphertexts', {})
-
-    if not file_id or not kem_cts:
+    if not data.get('fileId') or not data.get('kemCiphertexts'):
         return jsonify({'error': 'fileId and kemCiphertexts are required'}), 400
 
+    parsed = _parse_share(data)
+    if not parsed:
+        return jsonify({'error': 'kemCiphertexts must map user ids to ciphertexts'}), 400
+    file_id, kem_cts = parsed
+
+    unknown = _non_members(group_id, kem_cts)
+    if unknown:
+        return jsonify({'error': 'kemCiphertexts includes non-members', 'userIds': unknown}), 400
+
     # Validate file ownership
-    meta = FileMetadata.query.get(file_id)
+    meta = db.session.get(FileMetadata, file_id)
     if not meta or meta.owner_id != user_id:
         return jsonify({'error': 'File not found or access denied'}), 404
 
-    # Check for existing group access
-    existing = GroupFileAccess.query.filter_by(
-        file_id=file_id, group_id=group_id
-    ).first()
-    if existing:
-        # Update existing ciphertexts
-        existing.kem_ciphertexts = json.dumps(kem_cts)
-        db.session.commit()
-        return jsonify(existing.to_dict())
-
-    gfa = GroupFileAccess(
-        file_id=file_id,
-        group_id=group_id,
-        shared_by=user_id,
-        kem_ciphertexts=json.dumps(kem_cts),
-    )
-    db.session.add(gfa)
+    [(share, created)] = _upsert_group_shares(group_id, user_id, [(meta, kem_cts)])
+    return jsonify(share), 201 if created else 200
 
-    # Log
-    hist = FileHistory(
-        user_id=user_id,
-        name=meta.file_name,
-        original_size=meta.original_size,
-        encrypted_size=meta.encrypted_size,
-        file_type='group-share',
-        operation='share',
-    )
-    db.session.add(hist)
-    db.session.commit()
 
-    return jsonify(gfa.to_dict()), 201
+@groups_bp.route('/<int:group_id>/share-files', methods=['POST'])
+@jwt_required()
+def share_files_with_group(group_id):
+    """
+    Share several encrypted files with a group in one request.
+    Body: { shares: [ { fileId, kemCiphertexts }, ... ] }
+    """
+    user_id = int(get_jwt_identity())
+    row = _load_group_and_role(group_id, user_id)
+    if not row:
+        return jsonify({'error': 'Group not found'}), 404
+
+    group, membership = row
+    if not membership and group.owner_id != user_id:
+        return jsonify({'error': 'You are not a member of this group'}), 403
+
+    data = request.get_json(silent=True) or {}
+    shares = data.get('shares')
+    if not isinstance(shares, list) or not shares:
+        return jsonify({'error': 'shares must be a non-empty list'}), 400
+    if len(shares) > MAX_BULK_SHARES:
+        return jsonify({'error': f'At most {MAX_BULK_SHARES} shares per request'}), 400
+
+    # Later entries for the same file win
+    kem_by_file = {}
+    for item in shares:
+        parsed = _parse_share(item) if isinstance(item, dict) else None
+        if not parsed:
+            return jsonify({'error': 'Each share needs fileId and kemCiphertexts'}), 400
+        file_id, kem_cts = parsed
+        kem_by_file[file_id] = kem_cts
+
+    unknown = _non_members(group_id, {uid for cts in kem_by_file.values() for uid in cts})
+    if unknown:
+        return jsonify({'error': 'kemCiphertexts includes non-members', 'userIds': unknown}), 400
+
+    # Validate file ownership for the whole batch in one query
+    metas = FileMetadata.query.filter(
+        FileMetadata.id.in_(kem_by_file),
+        FileMetadata.owner_id == user_id,
+    ).all()
+    if len(metas) != len(kem_by_file):
+        return jsonify({'error': 'File not found or access denied'}), 404
+
+    results = _upsert_group_shares(
+        group_id, user_id, [(m, kem_by_file[m.id]) for m in metas]
+    )
+    status = 201 if any(created for _, created in results) else 200
+    return jsonify([share for share, _ in results]), status
 
 
 # ── List group-shared files accessible to me ─────────────
@@ -294,32 +542,22 @@ def list_group_shared_files():
     """
     user_id = int(get_jwt_identity())
 
-    # Get all groups user is a member of
-    memberships = GroupMembership.query.filter_by(user_id=user_id).all()
-    group_ids = [m.group_id for m in memberships]
-
-    if not group_ids:
-        return jsonify([])
-
-    accesses = GroupFileAccess.query.filter(
-        GroupFileAccess.group_id.in_(group_ids)
-    ).all()
-
-    result = []
-    for a in accesses:
-        d = a.to_dict()
-        # Extract this user's KEM ciphertext
-        try:
-            cts = json.loads(a.kem_ciphertexts)
-            d['myKemCiphertext'] = cts.get(str(user_id), None)
-        except (json.JSONDecodeError, AttributeError):
-            d['myKemCiphertext'] = None
-        # Include file IV for decryption
-        if a.file:
-            d['iv'] = a.file.iv
-            d['contentType'] = a.file.content_type
-            d['originalSize'] = a.file.original_size
-        result.append(d)
+    with read_only():
+        # One join from my memberships to the shares, files and my ciphertext row
+        rows = db.session.query(*_GROUP_SHARE_COLUMNS).select_from(GroupMembership).join(
+            GroupFileAccess, GroupFileAccess.group_id == GroupMembership.group_id
+        ).join(
+            Group, Group.id == GroupFileAccess.group_id
+        ).join(
+            FileMetadata, FileMetadata.id == GroupFileAccess.file_id
+        ).join(
+            User, User.id == GroupFileAccess.shared_by
+        ).outerjoin(
+            GroupFileAccessCiphertext,
+            (GroupFileAccessCiphertext.access_id == GroupFileAccess.id)
+            & (GroupFileAccessCiphertext.user_id == user_id),
+        ).filter(GroupMembership.user_id == user_id)
+        result = [dict(r._mapping) for r in rows]
 
     return jsonify(result)
 
@@ -333,27 +571,38 @@ def get_group_pubkeys(group_id):
     Return all group members' Kyber public keys for bulk KEM encapsulation.
     """
     user_id = int(get_jwt_identity())
-    group = Group.query.get(group_id)
-    if not group:
+    row = _load_group_and_role(group_id, user_id)
+    if not row:
         return jsonify({'error': 'Group not found'}), 404
 
-    # Check membership
-    membership = GroupMembership.query.filter_by(
-        group_id=group_id, user_id=user_id
-    ).first()
+    group, membership = row
     if not membership and group.owner_id != user_id:
         return jsonify({'error': 'Access denied'}), 403
 
-    members = GroupMembership.query.filter_by(group_id=group_id).all()
-    result = []
-    for m in members:
-        if m.user and m.user.kyber_public_key:
-            result.append({
-                'userId': m.user_id,
-                'researcherId': m.user.researcher_id,
-                'kyberPublicKey': m.user.kyber_public_key,
-            })
-
+    # The key set is the same for every member; access was checked above
+    cache_key = _GROUP_PUBKEYS_KEY.format(group_id)
+    cached = _group_cache_get(cache_key)
+    if cached is not None:
+        return jsonify(cached)
+
+    with read_only():
+        # Members without a key are filtered out in SQL; users ride along on the join
+        members = GroupMembership.query.join(GroupMembership.user).options(
+            contains_eager(GroupMembership.user)
+        ).filter(
+            GroupMembership.group_id == group_id,
+            User.kyber_public_key.isnot(None),
+        ).all()
+        result = []
+        for m in members:
+            if m.user and m.user.kyber_public_key:
+                result.append({
+                    'userId': m.user_id,
+                    'researcherId': m.user.researcher_id,
+                    'kyberPublicKey': m.user.kyber_public_key,
+                })
+
+    _group_cache_put(cache_key, result)
     return jsonify(result)
 
 
@@ -364,12 +613,23 @@ def get_group_pubkeys(group_id):
 def delete_group(group_id):
     """Delete a group. Only the owner can delete."""
     user_id = int(get_jwt_identity())
-    group = Group.query.get(group_id)
-    if not group:
+    owner_id = db.session.query(Group.owner_id).filter_by(id=group_id).scalar()
+    if owner_id is None:
         return jsonify({'error': 'Group not found'}), 404
-    if group.owner_id != user_id:
+    if owner_id != user_id:
         return jsonify({'error': 'Only the owner can delete this group'}), 403
 
-    db.session.delete(group)
+    audience = _group_audience(group_id)
+
+    # Bulk deletes bypass the ORM cascade, so clear child rows first
+    db.session.execute(db.delete(GroupFileAccessCiphertext).where(
+        GroupFileAccessCiphertext.access_id.in_(
+            db.select(GroupFileAccess.id).where(GroupFileAccess.group_id == group_id)
+        )
+    ))
+    db.session.execute(db.delete(GroupFileAccess).where(GroupFileAccess.group_id == group_id))
+    db.session.execute(db.delete(GroupMembership).where(GroupMembership.group_id == group_id))
+    db.session.execute(db.delete(Group).where(Group.id == group_id))
     db.session.commit()
+    _evict_group_caches(group_id, audience)
     return jsonify({'message': 'Group deleted'})
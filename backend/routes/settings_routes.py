@@ -4,7 +4,7 @@ User settings routes.
 
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, UserSettings
+from models import db, read_only, upsert_insert, UserSettings
 
 settings_bp = Blueprint('settings', __name__)
 
@@ -19,24 +19,35 @@ DEFAULTS = {
     'audit_logging': True,
 }
 
+# Request key -> column
+_FIELDS = {
+    'algorithm': 'algorithm',
+    'keySize': 'key_size',
+    'autoDelete': 'auto_delete',
+    'animations': 'animations',
+    'highContrast': 'high_contrast',
+    'sessionTimeout': 'session_timeout',
+    'twoFactor': 'two_factor',
+    'auditLogging': 'audit_logging',
+}
+
+_SETTINGS_COLUMNS = tuple(
+    getattr(UserSettings, col).label(key) for key, col in _FIELDS.items()
+)
+
+# Served as-is to users who never saved settings; treat as read-only
+_DEFAULT_RESPONSE = {key: DEFAULTS[col] for key, col in _FIELDS.items()}
+
 
 @settings_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_settings():
     user_id = int(get_jwt_identity())
-    s = UserSettings.query.filter_by(user_id=user_id).first()
-    if not s:
-        return jsonify({
-            'algorithm': DEFAULTS['algorithm'],
-            'keySize': DEFAULTS['key_size'],
-            'autoDelete': DEFAULTS['auto_delete'],
-            'animations': DEFAULTS['animations'],
-            'highContrast': DEFAULTS['high_contrast'],
-            'sessionTimeout': DEFAULTS['session_timeout'],
-            'twoFactor': DEFAULTS['two_factor'],
-            'auditLogging': DEFAULTS['audit_logging'],
-        })
-    return jsonify(s.to_dict())
+    with read_only():
+        row = db.session.query(*_SETTINGS_COLUMNS).filter(UserSettings.user_id == user_id).first()
+    if not row:
+        return jsonify(_DEFAULT_RESPONSE)
+    return jsonify(dict(row._mapping))
 
 
 @settings_bp.route('/', methods=['PUT'])
@@ -44,20 +55,17 @@ def get_settings():
 def update_settings():
     user_id = int(get_jwt_identity())
     data = request.get_json(silent=True) or {}
+    changes = {col: data[key] for key, col in _FIELDS.items() if key in data}
 
-    s = UserSettings.query.filter_by(user_id=user_id).first()
-    if not s:
-        s = UserSettings(user_id=user_id)
-        db.session.add(s)
-
-    s.algorithm = data.get('algorithm', s.algorithm or DEFAULTS['algorithm'])
-    s.key_size = data.get('keySize', s.key_size or DEFAULTS['key_size'])
-    s.auto_delete = data.get('autoDelete', s.auto_delete if s.auto_delete is not None else DEFAULTS['auto_delete'])
-    s.animations = data.get('animations', s.animations if s.animations is not None else DEFAULTS['animations'])
-    s.high_contrast = data.get('highContrast', s.high_contrast if s.high_contrast is not None else DEFAULTS['high_contrast'])
-    s.session_timeout = data.get('sessionTimeout', s.session_timeout or DEFAULTS['session_timeout'])
-    s.two_factor = data.get('twoFactor', s.two_factor if s.two_factor is not None else DEFAULTS['two_factor'])
-    s.audit_logging = data.get('auditLogging', s.audit_logging if s.audit_logging is not None else DEFAULTS['audit_logging'])
-
+    # One INSERT ... ON CONFLICT: new rows start from DEFAULTS, existing rows
+    # only take the fields sent. With nothing to change, a no-op update
+    # still lets RETURNING yield the current row.
+    stmt = upsert_insert(UserSettings).values(user_id=user_id, **{**DEFAULTS, **changes})
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id'],
+        set_={col: stmt.excluded[col] for col in changes} or {'user_id': stmt.excluded.user_id},
+    ).returning(UserSettings)
+    s = db.session.scalars(stmt, execution_options={'populate_existing': True}).one()
+    result = s.to_dict()
     db.session.commit()
-    return jsonify(s.to_dict())
+    return jsonify(result)
@@ -0,0 +1,77 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from config import Config  # noqa: E402
+from models import db, init_db  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    db_path = tmp_path / 'byteguard.db'
+    storage = tmp_path / 'storage'
+    storage.mkdir()
+
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+        SQLALCHEMY_BINDS = {
+            'ro': {'url': f'sqlite:///file:{db_path}?mode=ro&uri=true'},
+        }
+        STORAGE_DIR = str(storage)
+        STORAGE_ACCEL_PREFIX = None
+        REDIS_URL = None
+        RATELIMIT_STORAGE_URI = 'memory://'
+        RATELIMIT_ENABLED = False
+
+    app = create_app(TestConfig)
+    app.config['TESTING'] = True
+    with app.app_context():
+        init_db()
+
+    # Process-local caches outlive the app; start every test cold
+    from routes import auth_routes, group_routes
+    auth_routes._verified.clear()
+    auth_routes._pubkeys.clear()
+    group_routes._group_cache.clear()
+
+    yield app
+
+    app.extensions['history_writer'].close()
+    with app.app_context():
+        db.engine.dispose()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def register(client, researcher_id, password='correct horse battery', kyber_key='a2V5'):
+    resp = client.post('/api/auth/register', json={
+        'researcherId': researcher_id,
+        'password': password,
+        'kyberPublicKey': kyber_key,
+    })
+    assert resp.status_code == 201, resp.get_json()
+    body = resp.get_json()
+    return body['user']['id'], {'Authorization': f"Bearer {body['token']}"}
+
+
+def upload(client, headers, name='notes.txt', body=b'ciphertext-bytes'):
+    resp = client.post('/api/files/upload-raw', data=body, headers={
+        **headers, 'X-File-Name': name, 'X-Original-Size': str(len(body)),
+    })
+    assert resp.status_code == 201, resp.get_json()
+    return resp.get_json()['id']
+
+
+def create_group(client, headers, name='lab'):
+    resp = client.post('/api/groups/create', json={'name': name}, headers=headers)
+    assert resp.status_code == 201, resp.get_json()
+    return resp.get_json()['id']
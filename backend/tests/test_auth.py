@@ -0,0 +1,71 @@
+"""
+Researcher search and public key lookup.
+"""
+
+from conftest import register
+from models import db
+from routes.auth_routes import _login_rate_key
+
+
+def test_search_is_case_insensitive_prefix(client):
+    _, headers = register(client, 'alice')
+    register(client, 'Bob_Smith')
+    register(client, 'bobby')
+    register(client, 'carol')
+
+    resp = client.get('/api/auth/search?q=BOB', headers=headers)
+    assert sorted(u['researcherId'] for u in resp.get_json()) == ['Bob_Smith', 'bobby']
+
+
+def test_search_escapes_wildcards(client):
+    _, headers = register(client, 'alice')
+    register(client, 'Bob_Smith')
+    register(client, 'bobby')
+
+    resp = client.get('/api/auth/search?q=%25', headers=headers)  # q=%
+    assert resp.get_json() == []
+    resp = client.get('/api/auth/search?q=bob_', headers=headers)
+    assert [u['researcherId'] for u in resp.get_json()] == ['Bob_Smith']
+
+
+def test_researcher_ids_are_case_sensitive(client):
+    register(client, 'alice', password='secret-pass')
+    register(client, 'Alice')
+
+    resp = client.post('/api/auth/login', json={'researcherId': 'ALICE', 'password': 'secret-pass'})
+    assert resp.status_code == 401
+    resp = client.post('/api/auth/login', json={'researcherId': 'alice', 'password': 'secret-pass'})
+    assert resp.status_code == 200
+
+
+def test_login_rate_key_ignores_case(app):
+    keys = set()
+    for spelling in ('alice', 'ALICE', ' Alice '):
+        with app.test_request_context(json={'researcherId': spelling}):
+            keys.add(_login_rate_key())
+    assert keys == {'alice'}
+
+
+def test_search_uses_nocase_index(app, client):
+    _, headers = register(client, 'alice')
+    with app.app_context():
+        plan = db.session.execute(db.text(
+            "EXPLAIN QUERY PLAN SELECT id FROM users WHERE researcher_id LIKE 'bo%' ESCAPE '/'"
+        )).all()
+    assert 'ix_users_researcher_id_nocase' in plan[0].detail
+
+
+def test_pubkey_cache_follows_key_rotation(client):
+    _, alice = register(client, 'alice')
+    _, bob = register(client, 'bob', kyber_key='b2xk')
+
+    resp = client.get('/api/auth/pubkey/bob', headers=alice)
+    assert resp.get_json() == {'researcherId': 'bob', 'kyberPublicKey': 'b2xk'}
+    resp = client.get('/api/auth/pubkey/BOB', headers=alice)
+    assert resp.status_code == 404
+
+    resp = client.put('/api/auth/kyber-key', json={'kyberPublicKey': 'bmV3'}, headers=bob)
+    assert resp.status_code == 200
+
+    resp = client.get('/api/auth/pubkey/bob', headers=alice)
+    assert resp.get_json()['kyberPublicKey'] == 'bmV3'
@@ -0,0 +1,41 @@
+"""
+Connection handling: the read-only bind and the single SQLite writer.
+"""
+
+import sqlite3
+
+from conftest import register
+from models import db
+from routes import auth_routes
+
+
+def test_read_only_bind_on_rollback_journal_database(app, client):
+    _, headers = register(client, 'alice')
+    with app.app_context():
+        path = db.engine.url.database
+        for engine in db.engines.values():
+            engine.dispose()
+
+    # e.g. a database restored from a backup, before any writer reopens it
+    conn = sqlite3.connect(path)
+    assert conn.execute('PRAGMA journal_mode=DELETE').fetchone()[0] == 'delete'
+    conn.close()
+
+    resp = client.get('/api/files/received', headers=headers)
+    assert resp.status_code == 200
+    resp = client.get('/api/settings/', headers=headers)
+    assert resp.status_code == 200
+
+
+def test_login_releases_connections_before_bcrypt(app, client, monkeypatch):
+    register(client, 'alice', password='secret-pass')
+    check_password = auth_routes._check_password
+
+    def checked(password, stored):
+        for engine in db.engines.values():
+            assert engine.pool.checkedout() == 0
+        return check_password(password, stored)
+
+    monkeypatch.setattr(auth_routes, '_check_password', checked)
+    resp = client.post('/api/auth/login', json={'researcherId': 'alice', 'password': 'secret-pass'})
+    assert resp.status_code == 200
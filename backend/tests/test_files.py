@@ -0,0 +1,91 @@
+import io
+import os
+import hashlib
+from datetime import datetime
+
+from sqlalchemy import update
+
+from conftest import register, upload
+from models import db, FileMetadata
+
+
+def test_my_files_pages_through_shared_timestamps(app, client):
+    _, headers = register(client, 'alice')
+    ids = {upload(client, headers, name=f'f{i}.txt') for i in range(5)}
+
+    # Several rows on the page boundary share one created_at
+    with app.app_context():
+        db.session.execute(update(FileMetadata).values(created_at=datetime(2024, 1, 1)))
+        db.session.commit()
+
+    seen, cursor = [], None
+    while True:
+        params = {'limit': 2, **({'cursor': cursor} if cursor else {})}
+        resp = client.get('/api/files/my-files', query_string=params, headers=headers)
+        assert resp.status_code == 200
+        body = resp.get_json()
+        seen.extend(item['id'] for item in body['items'])
+        cursor = body['nextCursor']
+        if cursor is None:
+            break
+
+    assert len(seen) == len(set(seen))
+    assert set(seen) == ids
+
+
+def test_malformed_cursor_rejected(client):
+    _, headers = register(client, 'alice')
+    resp = client.get('/api/files/my-files', query_string={'cursor': 'nope'}, headers=headers)
+    assert resp.status_code == 400
+
+
+def _stored_blobs(app):
+    root = app.config['STORAGE_DIR']
+    return [name for _, _, names in os.walk(root) for name in names]
+
+
+def test_raw_upload_computes_hash(app, client):
+    _, headers = register(client, 'alice')
+    body = b'encrypted-payload' * 100
+    resp = client.post('/api/files/upload-raw', data=body, headers={
+        **headers, 'X-File-Name': 'a%20b.txt', 'X-Original-Size': '42',
+    })
+    assert resp.status_code == 201
+    meta = resp.get_json()
+    assert meta['fileName'] == 'a b.txt'
+    assert meta['originalSize'] == 42
+    assert meta['encryptedSize'] == len(body)
+    assert meta['sha256Hash'] == hashlib.sha256(body).hexdigest()
+    assert len(_stored_blobs(app)) == 1
+
+
+def test_raw_upload_rejects_bad_original_size(app, client):
+    _, headers = register(client, 'alice')
+    resp = client.post('/api/files/upload-raw', data=b'x', headers={
+        **headers, 'X-Original-Size': 'lots',
+    })
+    assert resp.status_code == 400
+    assert _stored_blobs(app) == []
+
+
+def test_raw_upload_removes_partial_blob(app, client):
+    _, headers = register(client, 'alice')
+    # The body ends before the announced length, as on a client disconnect
+    resp = client.post('/api/files/upload-raw', input_stream=io.BytesIO(b'partial'),
+                       environ_overrides={'CONTENT_LENGTH': str(1 << 16)},
+                       headers=headers)
+    assert resp.status_code == 400
+    assert _stored_blobs(app) == []
+    with app.app_context():
+        assert db.session.query(FileMetadata).count() == 0
+
+
+def test_multipart_upload_computes_hash(app, client):
+    _, headers = register(client, 'alice')
+    body = os.urandom(3 << 20)
+    resp = client.post('/api/files/upload', headers=headers, data={
+        'file': (io.BytesIO(body), 'big.bin'), 'originalSize': '7',
+    })
+    assert resp.status_code == 201
+    assert resp.get_json()['sha256Hash'] == hashlib.sha256(body).hexdigest()
+    assert len(_stored_blobs(app)) == 1
@@ -0,0 +1,132 @@
+"""
+Group sharing: membership, per-member ciphertexts, and the legacy blob migration.
+"""
+
+from conftest import register, upload, create_group
+from models import db, FileHistory, GroupFileAccess, GroupFileAccessCiphertext
+
+
+def _group_with_member(client):
+    alice_id, alice = register(client, 'alice')
+    bob_id, bob = register(client, 'bob')
+    gid = create_group(client, alice)
+    resp = client.post(f'/api/groups/{gid}/members', json={'researcherId': 'bob'}, headers=alice)
+    assert resp.status_code == 201
+    return gid, (alice_id, alice), (bob_id, bob)
+
+
+def test_share_and_list(client):
+    gid, (alice_id, alice), (bob_id, bob) = _group_with_member(client)
+    file_id = upload(client, alice)
+
+    kem = {str(alice_id): 'ct-alice', str(bob_id): 'ct-bob'}
+    resp = client.post(f'/api/groups/{gid}/share-file',
+                       json={'fileId': file_id, 'kemCiphertexts': kem}, headers=alice)
+    assert resp.status_code == 201
+
+    # Re-sharing refreshes the ciphertexts in place
+    kem[str(bob_id)] = 'ct-bob-2'
+    resp = client.post(f'/api/groups/{gid}/share-file',
+                       json={'fileId': file_id, 'kemCiphertexts': kem}, headers=alice)
+    assert resp.status_code == 200
+
+    resp = client.get('/api/groups/shared-files', headers=bob)
+    [item] = resp.get_json()
+    assert item['fileId'] == file_id
+    assert item['myKemCiphertext'] == 'ct-bob-2'
+
+
+def test_share_rejects_non_members(client):
+    gid, (alice_id, alice), _ = _group_with_member(client)
+    register(client, 'carol')
+    file_id = upload(client, alice)
+
+    for bad in ({'9999': 'Z'}, {'3': 'Z'}):  # unknown user, non-member
+        resp = client.post(f'/api/groups/{gid}/share-file',
+                           json={'fileId': file_id, 'kemCiphertexts': bad}, headers=alice)
+        assert resp.status_code == 400
+        resp = client.post(f'/api/groups/{gid}/share-files',
+                           json={'shares': [{'fileId': file_id, 'kemCiphertexts': bad}]},
+                           headers=alice)
+        assert resp.status_code == 400
+
+
+def test_share_rejects_non_decimal_ids(client):
+    gid, (alice_id, alice), _ = _group_with_member(client)
+    file_id = upload(client, alice)
+
+    # '\u00b2' passes str.isdigit() but not int()
+    for share in ({'fileId': '\u00b2', 'kemCiphertexts': {str(alice_id): 'Z'}},
+                  {'fileId': file_id, 'kemCiphertexts': {'\u00b2': 'Z'}}):
+        resp = client.post(f'/api/groups/{gid}/share-file', json=share, headers=alice)
+        assert resp.status_code == 400
+        resp = client.post(f'/api/groups/{gid}/share-files',
+                           json={'shares': [share]}, headers=alice)
+        assert resp.status_code == 400
+
+
+def test_migrate_kem_ciphertexts_skips_bad_entries(app, client):
+    gid, (alice_id, alice), (bob_id, _) = _group_with_member(client)
+    file_id = upload(client, alice)
+    other_file = upload(client, alice, name='other.txt')
+
+    with app.app_context():
+        good = GroupFileAccess(file_id=file_id, group_id=gid, shared_by=alice_id,
+                               kem_ciphertexts=f'{{"{bob_id}": "ct", "9999": "x", '
+                                               '"bob": "y", "\u00b2": "z"}')
+        broken = GroupFileAccess(file_id=other_file, group_id=gid, shared_by=alice_id,
+                                 kem_ciphertexts='not json')
+        db.session.add_all([good, broken])
+        db.session.commit()
+        good_id = good.id
+
+    result = app.test_cli_runner().invoke(args=['migrate-kem-ciphertexts'])
+    assert result.exit_code == 0, result.output
+    assert 'Migrated 1 group share(s), skipped 1' in result.output
+
+    with app.app_context():
+        rows = GroupFileAccessCiphertext.query.filter_by(access_id=good_id).all()
+        assert [(r.user_id, r.ciphertext) for r in rows] == [(bob_id, 'ct')]
+
+
+def test_bulk_share_logs_only_new_shares(app, client):
+    gid, (alice_id, alice), (bob_id, _) = _group_with_member(client)
+    first = upload(client, alice, name='first.txt')
+    second = upload(client, alice, name='second.txt')
+    kem = {str(alice_id): 'ct-alice', str(bob_id): 'ct-bob'}
+
+    resp = client.post(f'/api/groups/{gid}/share-file',
+                       json={'fileId': first, 'kemCiphertexts': kem}, headers=alice)
+    assert resp.status_code == 201
+
+    # One refreshed share plus one new share: still a 201, one more history row
+    resp = client.post(f'/api/groups/{gid}/share-files', json={'shares': [
+        {'fileId': first, 'kemCiphertexts': kem},
+        {'fileId': second, 'kemCiphertexts': kem},
+    ]}, headers=alice)
+    assert resp.status_code == 201
+
+    resp = client.post(f'/api/groups/{gid}/share-files', json={'shares': [
+        {'fileId': first, 'kemCiphertexts': kem},
+        {'fileId': second, 'kemCiphertexts': kem},
+    ]}, headers=alice)
+    assert resp.status_code == 200
+
+    app.extensions['history_writer'].close()
+    with app.app_context():
+        names = sorted(h.name for h in FileHistory.query.filter_by(operation='share'))
+    assert names == ['first.txt', 'second.txt']
+
+
+def test_list_groups_owned_first(client):
+    _, alice = register(client, 'alice')
+    _, bob = register(client, 'bob')
+    create_group(client, alice, name='alice-1')
+    create_group(client, bob, name='bob-1')
+    create_group(client, alice, name='alice-2')
+    for gid in (g['id'] for g in client.get('/api/groups/', headers=alice).get_json()):
+        client.post(f'/api/groups/{gid}/members', json={'researcherId': 'bob'}, headers=alice)
+    create_group(client, bob, name='bob-2')
+
+    resp = client.get('/api/groups/', headers=bob)
+    assert [g['name'] for g in resp.get_json()] == ['bob-1', 'bob-2', 'alice-1', 'alice-2']
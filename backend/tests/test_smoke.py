@@ -0,0 +1,41 @@
+"""
+Smoke tests: the app imports, the schema builds, and the listing
+endpoints answer for a freshly registered user.
+"""
+
+from conftest import register
+
+
+def test_health(client):
+    resp = client.get('/api/health')
+    assert resp.status_code == 200
+    assert resp.get_json()['status'] == 'ok'
+
+
+def test_list_endpoints_empty(client):
+    _, headers = register(client, 'alice')
+
+    for path in ('/api/files/my-files', '/api/files/shared', '/api/files/received'):
+        resp = client.get(path, headers=headers)
+        assert resp.status_code == 200, path
+        assert resp.get_json() == {'items': [], 'nextCursor': None}
+
+    for path in ('/api/groups/', '/api/groups/shared-files'):
+        resp = client.get(path, headers=headers)
+        assert resp.status_code == 200, path
+        assert resp.get_json() == []
+
+    resp = client.get('/api/files/history', headers=headers)
+    assert resp.status_code == 200
+
+    resp = client.get('/api/settings/', headers=headers)
+    assert resp.status_code == 200
+    assert resp.get_json()['algorithm'] == 'AES-256-GCM'
+
+
+def test_login(client):
+    register(client, 'alice', password='secret-pass')
+    resp = client.post('/api/auth/login', json={'researcherId': 'alice', 'password': 'secret-pass'})
+    assert resp.status_code == 200
+    resp = client.post('/api/auth/login', json={'researcherId': 'alice', 'password': 'wrong-pass'})
+    assert resp.status_code == 401
@@ -1,6 +1,6 @@
 /**
  * ByteGuard API Client — communicates with Flask backend.
- * Handles JWT auth, JSON requests, and multipart file uploads.
+ * Handles JWT auth, JSON requests, and raw/multipart file uploads.
  */
 
 const API_BASE = '/api';
@@ -20,7 +20,7 @@ function clearToken() {
 async function request(endpoint, options = {}) {
   const token = getToken();
   const headers = { ...options.headers };
-  if (!options._multipart) {
+  if (!options._multipart && !options._raw) {
     headers['Content-Type'] = 'application/json';
   }
   if (token) headers['Authorization'] = `Bearer ${token}`;
@@ -47,6 +47,20 @@ async function request(endpoint, options = {}) {
   return data;
 }
 
+// Follow nextCursor through a keyset-paginated listing and concatenate pages
+async function requestAllPages(endpoint) {
+  const items = [];
+  let cursor = null;
+  do {
+    const page = await request(
+      cursor ? `${endpoint}?cursor=${encodeURIComponent(cursor)}` : endpoint
+    );
+    items.push(...page.items);
+    cursor = page.nextCursor;
+  } while (cursor);
+  return items;
+}
+
 const api = {
   getToken,
   setToken,
@@ -91,6 +105,21 @@ const api = {
       _multipart: true,
     }),
 
+  uploadFileRaw: (blob, meta) =>
+    request('/files/upload-raw', {
+      method: 'POST',
+      body: blob,
+      headers: {
+        'Content-Type': 'application/octet-stream',
+        'X-File-Name': encodeURIComponent(meta.fileName),
+        'X-Original-Size': String(meta.originalSize),
+        'X-IV': meta.iv,
+        'X-SHA256': meta.sha256Hash,
+        'X-Content-Type': meta.contentType,
+      },
+      _raw: true,
+    }),
+
   downloadFile: (fileId) =>
     request(`/files/download/${fileId}`, { _binary: true }),
 
@@ -101,15 +130,15 @@ const api = {
     request(`/files/${fileId}/meta`),
 
   myFiles: () =>
-    request('/files/my-files'),
+    requestAllPages('/files/my-files'),
 
   // ── Sharing ────────────────────────────────────
   shareFile: (data) =>
     request('/files/share', { method: 'POST', body: JSON.stringify(data) }),
 
-  getShared: () => request('/files/shared'),
+  getShared: () => requestAllPages('/files/shared'),
 
-  getReceived: () => request('/files/received'),
+  getReceived: () => requestAllPages('/files/received'),
 
   getShareByCode: (shareCode) =>
     request(`/files/share/${shareCode}`),
@@ -168,6 +197,12 @@ const api = {
       body: JSON.stringify({ fileId, kemCiphertexts })
     }),
 
+  shareFilesWithGroup: (groupId, shares) =>
+    request(`/groups/${groupId}/share-files`, {
+      method: 'POST',
+      body: JSON.stringify({ shares })
+    }),
+
   listGroupSharedFiles: () =>
     request('/groups/shared-files'),
 };
@@ -66,16 +66,14 @@ export default function Encryption() {
       const encBlob = new Blob([iv, ciphertext]);
       const entropy = calcEntropy(ciphertext.slice(0, 4096));
 
-      // Upload to Flask backend
-      const formData = new FormData();
-      formData.append('file', encBlob, file.name + '.enc');
-      formData.append('fileName', file.name);
-      formData.append('originalSize', String(file.size));
-      formData.append('iv', uint8ToBase64(iv));
-      formData.append('sha256Hash', fingerprint);
-      formData.append('contentType', file.type || 'application/octet-stream');
-
-      const uploadResult = await api.uploadFile(formData);
+      // Upload to Flask backend as a raw body (no multipart framing)
+      const uploadResult = await api.uploadFileRaw(encBlob, {
+        fileName: file.name,
+        originalSize: file.size,
+        iv: uint8ToBase64(iv),
+        sha256Hash: fingerprint,
+        contentType: file.type || 'application/octet-stream',
+      });
 
       const res = {
         ...uploadResult,